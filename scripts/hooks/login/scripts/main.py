@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-import os, sys, subprocess
+import os, sys, shutil
+
+KNOWN_HOSTS = os.path.expanduser("~/.ssh/known_hosts")
 
 def main() -> int:
     host = os.environ.get("SOFILAB_HOST")
@@ -13,13 +15,17 @@ def main() -> int:
         return 2
 
     cmd = [ssh_bin, "-p", str(port), "-o", "StrictHostKeyChecking=accept-new",
-           "-o", f"UserKnownHostsFile={os.path.expanduser('~/.ssh/known_hosts')}"]
+           "-o", f"UserKnownHostsFile={KNOWN_HOSTS}"]
     if key and os.path.isfile(key):
         cmd += ["-i", key]
+    # Reuse (or start) sofilab's ControlMaster connection to this host
+    cmd += os.environ.get("SOFILAB_SSH_MUX_OPTS", "").split()
     cmd += [f"{user}@{host}"]
 
-    # Replace current process with ssh for full TTY behavior
-    os.execvp(cmd[0], cmd)
+    # Replace current process with ssh for full TTY behavior; resolve the binary
+    # once so execv does not walk $PATH again
+    resolved = shutil.which(ssh_bin) or ssh_bin
+    os.execv(resolved, cmd)
     return 0
 
 if __name__ == "__main__":
@@ -1,20 +1,208 @@
 #!/usr/bin/env python3
-import os, sys, time, socket, argparse
+import os, sys, time, errno, struct, socket, selectors
+from types import SimpleNamespace
 
-def check_port_open(host: str, port: int, timeout: float = 2.0) -> bool:
+# Imported on first use only (after the --diag short-circuit); cached so a
+# batch parent calling main() repeatedly does not re-resolve the import.
+_PARAMIKO = None
+
+def _import_paramiko():
+    global _PARAMIKO
+    if _PARAMIKO is None:
+        import paramiko
+        _PARAMIKO = paramiko
+    return _PARAMIKO
+
+# Fast primitives first: curve25519 KEX and AES-GCM/ETM MACs are the cheapest
+# handshake/packet path in Paramiko. These only reorder preferences, so servers
+# that lack them (e.g. older Dropbear) still negotiate the remaining algorithms.
+_FAST_KEX = ("curve25519-sha256@libssh.org", "curve25519-sha256")
+_FAST_CIPHERS = ("aes128-gcm@openssh.com", "aes128-ctr")
+_FAST_MACS = ("hmac-sha2-256-etm@openssh.com", "hmac-sha2-256")
+
+def _prefer(current, fast):
+    head = [a for a in fast if a in current]
+    return tuple(head + [a for a in current if a not in head])
+
+def _fast_transport(paramiko):
+    def factory(sock, **kwargs):
+        t = paramiko.Transport(sock, **kwargs)
+        opts = t.get_security_options()
+        opts.kex = _prefer(opts.kex, _FAST_KEX)
+        opts.ciphers = _prefer(opts.ciphers, _FAST_CIPHERS)
+        opts.digests = _prefer(opts.digests, _FAST_MACS)
+        return t
+    return factory
+
+# Parsed private keys keyed by (path, mtime): a batch parent reusing this module
+# skips re-reading and (for encrypted keys) re-running the KDF on every connect.
+_PKEYS = {}
+
+def _load_pkey(paramiko, path):
+    """Load `path` into a cached PKey, or return None so the caller falls back to key_filename."""
+    try:
+        cache_key = (path, os.stat(path).st_mtime)
+    except OSError:
+        return None
+    if cache_key in _PKEYS:
+        return _PKEYS[cache_key]
+    try:
+        with open(path, "r", errors="ignore") as f:
+            header = f.readline()
+    except OSError:
+        return None
+    if "RSA" in header:
+        classes = [paramiko.RSAKey]
+    elif "EC " in header:
+        classes = [paramiko.ECDSAKey]
+    else:
+        classes = [paramiko.Ed25519Key, paramiko.ECDSAKey, paramiko.RSAKey]
+    pkey = None
+    for cls in classes:
+        try:
+            pkey = cls.from_private_key_file(path)
+            break
+        except Exception:
+            continue
+    _PKEYS[cache_key] = pkey
+    return pkey
+
+def resolve_addr(host: str, port: int):
+    """Resolve host:port once; returns the first (family, socktype, proto, sockaddr) or None."""
+    try:
+        family, socktype, proto, _, sockaddr = socket.getaddrinfo(host, int(port), type=socket.SOCK_STREAM)[0]
+    except (OSError, IndexError):
+        return None
+    return family, socktype, proto, sockaddr
+
+# One selector (epoll on Linux) reused by every probe instead of a fresh
+# select() fd set per attempt. Probes are one connect per backoff step, so
+# there is nothing to batch for io_uring; epoll is the cheapest fit here.
+_SEL = None
+
+def _selector():
+    global _SEL
+    if _SEL is None:
+        _SEL = selectors.DefaultSelector()
+    return _SEL
+
+def check_port_open(addr, timeout: float = 2.0) -> bool:
+    """Non-blocking connect probe against a pre-resolved address (see resolve_addr):
+    a refused/unreachable port returns as soon as the RST/ICMP arrives instead of
+    waiting out the full timeout.
+
+    The probe socket is closed with an abortive RST (SO_LINGER 0) so repeated
+    probes leave no TIME_WAIT entries behind.
+    """
+    family, socktype, proto, sockaddr = addr
+    s = socket.socket(family, socktype, proto)
     try:
-        with socket.create_connection((host, int(port)), timeout=timeout):
+        try:
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        except OSError:
+            pass
+        s.setblocking(False)
+        rc = s.connect_ex(sockaddr)
+        if rc == 0:
             return True
+        if rc not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            return False
+        sel = _selector()
+        sel.register(s, selectors.EVENT_WRITE)
+        try:
+            if not sel.select(timeout):
+                return False
+        finally:
+            sel.unregister(s)
+        return s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+def check_sshd_ready(addr, timeout: float = 2.0) -> bool:
+    """True once the listener answers with an SSH identification banner.
+
+    An open port only means the socket is bound; the banner shows sshd is
+    actually serving connections.
+    """
+    family, socktype, proto, sockaddr = addr
+    s = socket.socket(family, socktype, proto)
+    try:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        s.settimeout(timeout)
+        s.connect(sockaddr)
+        return s.recv(64).startswith(b"SSH-")
     except OSError:
         return False
+    finally:
+        s.close()
+
+def _session_alive(transport) -> bool:
+    """Liveness check on the existing session: an SSH_MSG_IGNORE write fails fast
+    once the peer has reset the connection, before the reader thread notices EOF."""
+    if not transport.is_active():
+        return False
+    try:
+        transport.send_ignore()
+    except Exception:
+        return False
+    return transport.is_active()
+
+def wait_for(predicate, timeout: float, base: float = 0.05, factor: float = 1.3, cap: float = 5.0):
+    """Poll predicate(remaining) with exponential backoff until it returns True or timeout elapses.
+
+    `remaining` is the time left before the deadline so probes can bound their
+    own timeout. Returns (ok, attempts). Early probes are sub-second; later ones
+    back off to `cap`. The deadline is absolute, so `timeout` is an honest upper bound.
+    """
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        attempt += 1
+        if predicate(max(0.0, deadline - time.monotonic())):
+            return True, attempt
+        now = time.monotonic()
+        if now >= deadline:
+            return False, attempt
+        delay = min(cap, base * factor ** attempt)
+        # Wake at an absolute time, so probe latency does not accumulate as drift
+        time.sleep(max(0.0, min(now + delay, deadline) - time.monotonic()))
+
+def parse_args(argv):
+    """Parse the hook's four fixed flags (--flag value or --flag=value); unknown args are ignored.
+
+    Hand-rolled because argparse's import and parser setup dominate startup of
+    this short-lived hook.
+    """
+    args = SimpleNamespace(mode="reboot", wait=180, down_timeout=60, diag=False)
+    it = iter(argv)
+    for a in it:
+        name, eq, val = a.partition("=")
+        if name == "--diag":
+            args.diag = True
+            continue
+        if name not in ("--mode", "--wait", "--down-timeout"):
+            continue
+        if not eq:
+            val = next(it, None)
+            if val is None:
+                raise ValueError(f"{name} expects a value")
+        if name == "--mode":
+            args.mode = val
+        elif name == "--wait":
+            args.wait = int(val)
+        else:
+            args.down_timeout = int(val)
+    return args
 
 def main() -> int:
-    ap = argparse.ArgumentParser(add_help=False)
-    ap.add_argument("--mode", default="reboot")
-    ap.add_argument("--wait", type=int, default=180)
-    ap.add_argument("--down-timeout", dest="down_timeout", type=int, default=60)
-    ap.add_argument("--diag", action="store_true")
-    args, _ = ap.parse_known_args()
+    try:
+        args = parse_args(sys.argv[1:])
+    except ValueError as e:
+        print(f"Invalid arguments: {e}", file=sys.stderr)
+        return 2
 
     host = os.environ.get("SOFILAB_HOST")
     port = int(os.environ.get("SOFILAB_PORT", "22"))
@@ -29,61 +217,69 @@ def main() -> int:
 
     print(f"[reboot hook(py)] alias={alias} host={host} user={user} wait={args.wait}s", file=sys.stderr)
 
+    # Resolve once; the probe loops below reuse the address instead of hitting DNS per attempt
+    addr = resolve_addr(host, port)
+    if addr is None:
+        print(f"Cannot resolve {host}:{port}", file=sys.stderr)
+        return 2
+
     if args.diag:
-        print("[diag] check_port_open:", check_port_open(host, port), file=sys.stderr)
+        print("[diag] check_port_open:", check_port_open(addr), file=sys.stderr)
         return 0
 
     try:
-        import paramiko
+        paramiko = _import_paramiko()
     except Exception as e:
         print(f"paramiko not available: {e}", file=sys.stderr)
         return 3
 
     cli = paramiko.SSHClient()
     cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    pkey = _load_pkey(paramiko, keyfile) if keyfile else None
     try:
         cli.connect(hostname=host, port=port, username=user,
                     password=None if keyfile else password,
-                    key_filename=keyfile, look_for_keys=bool(keyfile is None),
-                    allow_agent=True, timeout=5, auth_timeout=5, banner_timeout=5)
+                    pkey=pkey, key_filename=None if pkey else keyfile, look_for_keys=bool(keyfile is None),
+                    allow_agent=True, timeout=5, auth_timeout=5, banner_timeout=5,
+                    compress=False, transport_factory=_fast_transport(paramiko))
     except Exception as e:
         print(f"SSH connect failed: {e}", file=sys.stderr)
         return 4
 
     try:
         cmd = "systemctl reboot || reboot || shutdown -r now"
+        down_deadline = time.monotonic() + args.down_timeout
         try:
             # Exec without PTY; server will likely close connection during reboot
-            chan = cli.get_transport().open_session()
+            transport = cli.get_transport()
+            chan = transport.open_session()
             chan.exec_command(cmd)
-            # Give command a moment to be accepted
-            time.sleep(1.0)
+            # Keep the session open: sshd tearing it down is the earliest sign the
+            # host is going down, and needs no extra connects to observe
+            print(f"Waiting for {host}:{port} to go down...", file=sys.stderr)
+            wait_for(lambda left: not _session_alive(transport), args.down_timeout, cap=0.5)
         finally:
             try:
                 cli.close()
             except Exception:
                 pass
 
-        # Wait for host to go down
-        print(f"Waiting for {host}:{port} to go down...", file=sys.stderr)
-        elapsed = 0
-        while check_port_open(host, port):
-            time.sleep(2)
-            elapsed += 2
-            if elapsed >= args.down_timeout:
-                print(f"Still reachable after {args.down_timeout}s; continuing", file=sys.stderr)
-                break
+        # Confirm the listener is gone too; usually the first probe settles it, and
+        # this is the only check when the session stayed half-open
+        left = max(0.0, down_deadline - time.monotonic())
+        down, attempts = wait_for(lambda rem: not check_port_open(addr, min(2.0, rem)), left)
+        if not down:
+            print(f"Still reachable after {args.down_timeout}s; continuing ({attempts} probes)", file=sys.stderr)
 
         # Wait for host to come back
         print(f"Waiting for host to come back (up to {args.wait}s)...", file=sys.stderr)
-        elapsed = 0
-        while not check_port_open(host, port):
-            time.sleep(3)
-            elapsed += 3
-            if elapsed >= args.wait:
-                print(f"Timeout waiting for {host}:{port} to return", file=sys.stderr)
-                return 1
-        print(f"Host is back online: {host}:{port}", file=sys.stderr)
+        # Cheap non-blocking probe first; read the banner only once the port accepts
+        up, attempts = wait_for(lambda left: check_port_open(addr, min(2.0, left))
+                                and check_sshd_ready(addr, min(2.0, max(left, 0.1))), args.wait)
+        if not up:
+            print(f"Timeout waiting for {host}:{port} to return ({attempts} probes)", file=sys.stderr)
+            return 1
+        print(f"Host is back online: {host}:{port} ({attempts} probes)", file=sys.stderr)
         return 0
     except Exception as e:
         print(f"Reboot trigger failed: {e}", file=sys.stderr)
@@ -1,15 +1,302 @@
 #!/usr/bin/env python3
-import os, sys
+import os, sys, atexit, shutil, subprocess, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Clients are cached per (user, host, port, key) so a parent that drives several
+# status probes in one process pays the SSH handshake only once per target.
+_POOL = {}
+_POOL_LOCK = threading.Lock()
+
+# Bounded fan-out for main_many(); sshd's default MaxStartups is 10, so keep
+# concurrent handshakes against any single host below that.
+MAX_WORKERS = 32
+MAX_PER_HOST = 8
+_HOST_SLOTS = {}
+
+STATUS_CMDS = ("hostname", "uptime", "uname -sr")
+_DELIM = "__SOFI__"
+# One remote exec for all probes: each command's stderr is folded into its own
+# section so the "out or err" reporting stays per-command.
+_BATCH_CMD = f"; echo {_DELIM}; ".join(f"{c} 2>&1" for c in STATUS_CMDS)
+
+# Imported on first use only: paramiko pulls in cryptography (100-300 ms cold),
+# which the OpenSSH path and the env-validation failure path never need.
+_PARAMIKO = None
 
 def ensure_paramiko():
+    global _PARAMIKO
+    if _PARAMIKO is not None:
+        return _PARAMIKO
     try:
         import paramiko  # type: ignore
+        _PARAMIKO = paramiko
         return paramiko
     except Exception as e:
         print(f"Paramiko not available: {e}", file=sys.stderr)
         print("Install with: python -m pip install paramiko", file=sys.stderr)
         sys.exit(3)
 
+# Fast primitives first: curve25519 KEX and AES-GCM/ETM MACs are the cheapest
+# handshake/packet path in Paramiko. These only reorder preferences, so servers
+# that lack them (e.g. older Dropbear) still negotiate the remaining algorithms.
+_FAST_KEX = ("curve25519-sha256@libssh.org", "curve25519-sha256")
+_FAST_CIPHERS = ("aes128-gcm@openssh.com", "aes128-ctr")
+_FAST_MACS = ("hmac-sha2-256-etm@openssh.com", "hmac-sha2-256")
+
+def _prefer(current, fast):
+    head = [a for a in fast if a in current]
+    return tuple(head + [a for a in current if a not in head])
+
+def _fast_transport(paramiko):
+    def factory(sock, **kwargs):
+        t = paramiko.Transport(sock, **kwargs)
+        opts = t.get_security_options()
+        opts.kex = _prefer(opts.kex, _FAST_KEX)
+        opts.ciphers = _prefer(opts.ciphers, _FAST_CIPHERS)
+        opts.digests = _prefer(opts.digests, _FAST_MACS)
+        return t
+    return factory
+
+def _use_async():
+    """Return the asyncssh module when the async path is opted into and importable, else None.
+
+    Opt in with SOFILAB_STATUS_ASYNC=1; the handshake then runs on an event loop
+    (uvloop if installed) and the status commands share one transport.
+    """
+    if os.environ.get("SOFILAB_STATUS_ASYNC", "") not in ("1", "true", "yes"):
+        return None
+    try:
+        import asyncssh  # type: ignore
+        return asyncssh
+    except Exception:
+        return None
+
+async def _status_async(asyncssh, host, port, user, key, pwd):
+    import asyncio
+    opts = dict(port=port, username=user, known_hosts=None, connect_timeout=5)
+    if key:
+        opts["client_keys"] = [key]
+    elif pwd:
+        opts["password"] = pwd
+    async with asyncssh.connect(host, **opts) as conn:
+        # One channel per command, all multiplexed over the single transport
+        results = await asyncio.gather(*(conn.run(c, stderr=asyncssh.STDOUT) for c in STATUS_CMDS))
+    return [f"{c}: {(r.stdout or '').strip()}" for c, r in zip(STATUS_CMDS, results)]
+
+def _run_async(asyncssh, target):
+    """Run _status_async to completion; returns lines or None on any failure."""
+    import asyncio
+    try:
+        import uvloop  # type: ignore
+        loop = uvloop.new_event_loop()
+    except Exception:
+        loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(_status_async(asyncssh, *target), 15))
+    except Exception:
+        return None
+    finally:
+        loop.close()
+
+# Parsed private keys keyed by (path, mtime): a batch parent reusing this module
+# skips re-reading and (for encrypted keys) re-running the KDF on every connect.
+_PKEYS = {}
+
+def _load_pkey(paramiko, path):
+    """Load `path` into a cached PKey, or return None so the caller falls back to key_filename."""
+    try:
+        cache_key = (path, os.stat(path).st_mtime)
+    except OSError:
+        return None
+    if cache_key in _PKEYS:
+        return _PKEYS[cache_key]
+    try:
+        with open(path, "r", errors="ignore") as f:
+            header = f.readline()
+    except OSError:
+        return None
+    if "RSA" in header:
+        classes = [paramiko.RSAKey]
+    elif "EC " in header:
+        classes = [paramiko.ECDSAKey]
+    else:
+        classes = [paramiko.Ed25519Key, paramiko.ECDSAKey, paramiko.RSAKey]
+    pkey = None
+    for cls in classes:
+        try:
+            pkey = cls.from_private_key_file(path)
+            break
+        except Exception:
+            continue
+    _PKEYS[cache_key] = pkey
+    return pkey
+
+def _close_pool() -> None:
+    with _POOL_LOCK:
+        clients = list(_POOL.values())
+        _POOL.clear()
+    for cli in clients:
+        try:
+            cli.close()
+        except Exception:
+            pass
+
+atexit.register(_close_pool)
+
+def get_client(host: str, port: int, user: str, key=None, pwd=None):
+    """Return a connected SSHClient for the target, reusing a pooled one if still active."""
+    pool_key = (user, host, port, key)
+    with _POOL_LOCK:
+        cli = _POOL.get(pool_key)
+        if cli is not None:
+            transport = cli.get_transport()
+            if transport is not None and transport.is_active():
+                return cli
+            _POOL.pop(pool_key, None)
+
+    paramiko = ensure_paramiko()
+    cli = paramiko.SSHClient()
+    cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    pkey = _load_pkey(paramiko, key) if key else None
+    cli.connect(hostname=host, port=port, username=user,
+                password=None if key else pwd,
+                pkey=pkey, key_filename=None if pkey else key,
+                look_for_keys=bool(key is None), allow_agent=True,
+                timeout=5, auth_timeout=5, banner_timeout=5,
+                compress=False, transport_factory=_fast_transport(paramiko))
+    with _POOL_LOCK:
+        _POOL[pool_key] = cli
+    return cli
+
+def _openssh_base(host: str, port: int, user: str, key=None):
+    """Return an ssh argv prefix using ControlMaster multiplexing, or None if unusable.
+
+    OpenSSH does the KEX/auth in C and the master socket lets follow-up commands
+    (and later hook runs within ControlPersist) skip the handshake entirely.
+    """
+    if os.name == "nt":
+        return None
+    ssh_bin = shutil.which(os.environ.get("SSH_BIN", "ssh"))
+    if not ssh_bin:
+        return None
+    base = [ssh_bin, "-p", str(port),
+            "-o", "BatchMode=yes",
+            "-o", "ConnectTimeout=5",
+            "-o", "StrictHostKeyChecking=accept-new"]
+    mux_opts = os.environ.get("SOFILAB_SSH_MUX_OPTS")
+    if mux_opts is not None:
+        # Exported by sofilab (empty when multiplexing is disabled): the same
+        # master connection as sofilab itself and the login hook
+        base += mux_opts.split()
+    elif os.environ.get("SOFILAB_DISABLE_SSH_MUX") != "1":
+        # Run outside sofilab: same options it would export. The socket lives in the user's own 0700 ~/.ssh, never a guessable name
+        # in the shared temp dir that another local user could create first.
+        # %C is a short hash of (local host, remote host, port, user): keeps the
+        # path well under the AF_UNIX length limit for long hostnames.
+        ssh_dir = os.path.expanduser("~/.ssh")
+        os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
+        base += ["-o", "ControlMaster=auto",
+                 "-o", f"ControlPath={os.path.join(ssh_dir, 'sofilab-%C')}",
+                 "-o", "ControlPersist=600"]
+    if key and os.path.isfile(key):
+        base += ["-i", key]
+    return base + [f"{user}@{host}"]
+
+def _format_batched(output: str):
+    sections = output.split(f"{_DELIM}\n")
+    lines = []
+    for i, cmd in enumerate(STATUS_CMDS):
+        line = sections[i].strip() if i < len(sections) else ""
+        lines.append(f"{cmd}: {line}")
+    return lines
+
+def _status_openssh(ssh_base):
+    """Run the status commands through OpenSSH. Returns None if ssh itself could not connect."""
+    try:
+        # BatchMode makes this fail fast (exit 255) instead of prompting when only
+        # password auth would work; the call also establishes the master socket.
+        # ssh_base[0] is an absolute path and close_fds=False, which lets
+        # subprocess use posix_spawn instead of fork+exec of this process.
+        # Python-created fds are non-inheritable (PEP 446), so nothing leaks.
+        r = subprocess.run(ssh_base + [_BATCH_CMD], stdin=subprocess.DEVNULL,
+                           capture_output=True, timeout=15, close_fds=False)
+    except Exception:
+        return None
+    if r.returncode == 255:
+        return None
+    return _format_batched(r.stdout.decode("utf-8", errors="ignore"))
+
+def _probe_one(target):
+    """Collect status for one (host, port, user, key, pwd) target.
+
+    Returns (rc, lines, error). Output is returned rather than printed so
+    concurrent probes can be reported in a deterministic order.
+    """
+    host, port, user, key, pwd = target
+    # Prefer system OpenSSH with multiplexing; fall back to Paramiko when it is not
+    # available or key/agent auth does not work non-interactively (password-only hosts).
+    ssh_base = _openssh_base(host, port, user, key)
+    if ssh_base:
+        lines = _status_openssh(ssh_base)
+        if lines is not None:
+            return 0, lines, None
+
+    asyncssh = _use_async()
+    if asyncssh is not None:
+        lines = _run_async(asyncssh, target)
+        if lines is not None:
+            return 0, lines, None
+
+    try:
+        cli = get_client(host, port, user, key, pwd)
+    except Exception as e:
+        return 1, [], f"SSH connection failed: {e}"
+
+    try:
+        stdin, stdout, stderr = cli.exec_command(_BATCH_CMD, timeout=5)
+        return 0, _format_batched(stdout.read().decode("utf-8", errors="ignore")), None
+    except Exception as e:
+        return 0, [f"{cmd}: error: {e}" for cmd in STATUS_CMDS], None
+
+def _probe_limited(target):
+    host = target[0]
+    with _POOL_LOCK:
+        slot = _HOST_SLOTS.setdefault(host, threading.BoundedSemaphore(MAX_PER_HOST))
+    with slot:
+        return _probe_one(target)
+
+def main_many(targets) -> int:
+    """Probe many (host, port, user, key, pwd) targets concurrently.
+
+    Wall-clock is bounded by the slowest host rather than the sum of round trips.
+    Results are printed in the order the targets were given.
+    """
+    targets = list(targets)
+    if not targets:
+        return 0
+    workers = min(MAX_WORKERS, len(targets))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(_probe_limited, targets))
+    rc_all = 0
+    for i, (host, port, user, _key, _pwd) in enumerate(targets):
+        rc, lines, err = results[i]
+        print(f"[{user}@{host}:{port}]")
+        for ln in lines:
+            print(ln)
+        if err:
+            print(err, file=sys.stderr)
+        rc_all = rc_all or rc
+    return rc_all
+
+def _parse_target(spec: str, user: str, port: int, key, pwd):
+    # [user@]host[:port]
+    if "@" in spec:
+        user, spec = spec.split("@", 1)
+    if spec.count(":") == 1:
+        spec, port_s = spec.split(":", 1)
+        port = int(port_s)
+    return (spec, port, user, key, pwd)
+
 def main() -> int:
     host = os.environ.get("SOFILAB_HOST")
     port = int(os.environ.get("SOFILAB_PORT", "22"))
@@ -24,36 +311,20 @@ def main() -> int:
 
     print(f"[status hook(py)] alias={alias} host={host} port={port} user={user}")
 
-    paramiko = ensure_paramiko()
-    cli = paramiko.SSHClient()
-    cli.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    try:
-        cli.connect(hostname=host, port=port, username=user,
-                    password=None if key else pwd,
-                    key_filename=key,
-                    look_for_keys=bool(key is None), allow_agent=True,
-                    timeout=5, auth_timeout=5, banner_timeout=5)
-    except Exception as e:
-        print(f"SSH connection failed: {e}", file=sys.stderr)
-        return 1
-
-    try:
-        for cmd in ("hostname", "uptime", "uname -sr"):
-            try:
-                stdin, stdout, stderr = cli.exec_command(cmd, timeout=5)
-                out = stdout.read().decode("utf-8", errors="ignore").strip()
-                err = stderr.read().decode("utf-8", errors="ignore").strip()
-                line = out or err
-                print(f"{cmd}: {line}")
-            except Exception as e:
-                print(f"{cmd}: error: {e}")
-    finally:
-        try:
-            cli.close()
-        except Exception:
-            pass
-    return 0
+    # Extra hook args ([user@]host[:port] ...) fan out to additional targets,
+    # e.g. `sofilab status pmx -- root@10.0.0.2 admin@rt:2222`
+    extra = [a for a in sys.argv[1:] if a and not a.startswith("-")]
+    if extra:
+        targets = [(host, port, user, key, pwd)]
+        targets += [_parse_target(a, user, port, key, pwd) for a in extra]
+        return main_many(targets)
+
+    rc, lines, err = _probe_one((host, port, user, key, pwd))
+    for ln in lines:
+        print(ln)
+    if err:
+        print(err, file=sys.stderr)
+    return rc
 
 if __name__ == "__main__":
     sys.exit(main())
-
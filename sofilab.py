@@ -14,27 +14,36 @@ Notes:
 from __future__ import annotations
 
 import argparse
+import atexit
 import dataclasses
 import errno
+import functools
 import getpass
 import io
+import mmap
 import os
 import re
 import select
+import selectors
 import shlex
 import signal
 import socket
 import sys
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
 import importlib
 import subprocess
 import stat
+import tempfile
 import posixpath
 import shutil
 
+if TYPE_CHECKING:
+    import tarfile  # annotations only; imported at runtime by the tar helpers
+
 # Paramiko is loaded lazily. If missing, we will auto-install from requirements.txt.
 PARAMIKO_MOD = None  # type: ignore
 
@@ -74,7 +83,7 @@ def ensure_paramiko():
                     del sys.modules["paramiko"]
             except Exception:
                 pass
-            subprocess.check_call(cmd)
+            subprocess.check_call(cmd, close_fds=False)  # posix_spawn fast path, see _spawn
         except Exception as e:
             print(f"❌ Failed to install dependencies automatically: {e}", file=sys.stderr)
             print("Please run: python -m pip install paramiko>=3.4.0", file=sys.stderr)
@@ -83,35 +92,62 @@ def ensure_paramiko():
         return PARAMIKO_MOD
 
 
+def _prewarm_paramiko() -> None:
+    """Start importing paramiko in the background (import only, never auto-install).
+
+    The cold import (cryptography et al.) then overlaps with port checks and DNS;
+    ensure_paramiko() later finds the module already loaded or waits on the
+    import lock for the remainder.
+    """
+    if PARAMIKO_MOD is not None or "paramiko" in sys.modules:
+        return
+
+    def _load() -> None:
+        try:
+            importlib.import_module("paramiko")
+        except Exception:
+            pass
+
+    threading.Thread(target=_load, name="sofilab-prewarm", daemon=True).start()
+
+
 # --------------------------
 # Windows helpers
 # --------------------------
+@functools.lru_cache(maxsize=1)
+def _known_folder_api():
+    """Bind SHGetKnownFolderPath and the LocalAppData GUID once per process."""
+    import ctypes
+    from ctypes import wintypes
+
+    # FOLDERID_LocalAppData {F1B32785-6FBA-4FCF-9D55-7B8E7F157091}
+    class GUID(ctypes.Structure):
+        _fields_ = [
+            ("Data1", ctypes.c_ulong),
+            ("Data2", ctypes.c_ushort),
+            ("Data3", ctypes.c_ushort),
+            ("Data4", ctypes.c_ubyte * 8),
+        ]
+
+    folder_id = GUID(0xF1B32785, 0x6FBA, 0x4FCF, (ctypes.c_ubyte * 8)(0x9D, 0x55, 0x7B, 0x8E, 0x7F, 0x15, 0x70, 0x91))
+
+    fn = ctypes.windll.shell32.SHGetKnownFolderPath
+    fn.argtypes = [ctypes.POINTER(GUID), wintypes.DWORD, wintypes.HANDLE, ctypes.POINTER(ctypes.c_wchar_p)]
+    fn.restype = ctypes.c_long
+    return ctypes, fn, folder_id
+
+
+@functools.lru_cache(maxsize=1)
 def _win_local_appdata() -> Optional[Path]:
     """Return LocalAppData path using Win32 API for robustness on Windows.
-    Falls back to environment variable or user home if needed.
+    Falls back to environment variable or user home if needed. Cached: the
+    known-folder lookup is paid at most once per process.
     """
     if os.name != 'nt':
         return None
     # Try Win32 SHGetKnownFolderPath(FOLDERID_LocalAppData)
     try:
-        import ctypes
-        from ctypes import wintypes
-
-        # FOLDERID_LocalAppData {F1B32785-6FBA-4FCF-9D55-7B8E7F157091}
-        class GUID(ctypes.Structure):
-            _fields_ = [
-                ("Data1", ctypes.c_ulong),
-                ("Data2", ctypes.c_ushort),
-                ("Data3", ctypes.c_ushort),
-                ("Data4", ctypes.c_ubyte * 8),
-            ]
-
-        FOLDERID_LocalAppData = GUID(0xF1B32785, 0x6FBA, 0x4FCF, (ctypes.c_ubyte * 8)(0x9D, 0x55, 0x7B, 0x8E, 0x7F, 0x15, 0x70, 0x91))
-
-        SHGetKnownFolderPath = ctypes.windll.shell32.SHGetKnownFolderPath
-        SHGetKnownFolderPath.argtypes = [ctypes.POINTER(GUID), wintypes.DWORD, wintypes.HANDLE, ctypes.POINTER(ctypes.c_wchar_p)]
-        SHGetKnownFolderPath.restype = ctypes.c_long
-
+        ctypes, SHGetKnownFolderPath, FOLDERID_LocalAppData = _known_folder_api()
         path_ptr = ctypes.c_wchar_p()
         # Flags = 0 (default). Token = None (current user)
         hr = SHGetKnownFolderPath(ctypes.byref(FOLDERID_LocalAppData), 0, None, ctypes.byref(path_ptr))
@@ -138,6 +174,104 @@ def _win_local_appdata() -> Optional[Path]:
     except Exception:
         return None
 
+
+def _win_env_key():
+    """HKCU\\Environment opened once for reading and writing, so Path and PATHEXT
+    are read and updated through one handle (usable as a context manager)."""
+    import winreg  # type: ignore
+    return winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_READ | winreg.KEY_SET_VALUE)
+
+
+def _win_path_key(entry: str) -> str:
+    """Comparison key for a Windows PATH entry: case-insensitive, no trailing separators."""
+    return entry.strip().casefold().rstrip("\\/")
+
+
+@functools.lru_cache(maxsize=1)
+def _reg_query_multiple_api():
+    """Bind advapi32.RegQueryMultipleValuesW and its VALENTW struct once per process."""
+    import ctypes
+    from ctypes import wintypes
+
+    class VALENTW(ctypes.Structure):
+        _fields_ = [
+            ("ve_valuename", wintypes.LPWSTR),
+            ("ve_valuelen", wintypes.DWORD),
+            ("ve_valueptr", ctypes.c_size_t),  # DWORD_PTR into the value buffer
+            ("ve_type", wintypes.DWORD),
+        ]
+
+    fn = ctypes.windll.advapi32.RegQueryMultipleValuesW
+    fn.argtypes = [wintypes.HANDLE, ctypes.POINTER(VALENTW), wintypes.DWORD, ctypes.c_void_p, ctypes.POINTER(wintypes.DWORD)]
+    fn.restype = ctypes.c_long
+    return ctypes, wintypes, fn, VALENTW
+
+
+def _win_query_values(key, names: Tuple[str, ...]) -> Dict[str, Tuple[str, int]]:
+    """Read several string values of an open registry key: name -> (value, type).
+
+    One RegQueryMultipleValuesW call when every value exists; otherwise (a
+    missing value fails the whole call) one QueryValueEx per name, leaving the
+    missing names out.
+    """
+    import winreg  # type: ignore
+    try:
+        ctypes, wintypes, query, VALENTW = _reg_query_multiple_api()
+        vals = (VALENTW * len(names))()
+        for v, name in zip(vals, names):
+            v.ve_valuename = name
+        buf = ctypes.create_string_buffer(64 << 10)
+        size = wintypes.DWORD(len(buf))
+        if query(key.handle, vals, len(names), buf, ctypes.byref(size)) == 0:
+            base = ctypes.addressof(buf)
+            out: Dict[str, Tuple[str, int]] = {}
+            for v, name in zip(vals, names):
+                if v.ve_type not in (winreg.REG_SZ, winreg.REG_EXPAND_SZ):
+                    raise ValueError(name)
+                off = v.ve_valueptr - base
+                out[name] = (buf.raw[off:off + v.ve_valuelen].decode("utf-16-le").rstrip("\0"), v.ve_type)
+            return out
+    except Exception:
+        pass
+    out = {}
+    for name in names:
+        try:
+            out[name] = winreg.QueryValueEx(key, name)
+        except FileNotFoundError:
+            pass
+    return out
+
+
+@functools.lru_cache(maxsize=1)
+def _send_message_timeout_api():
+    """Bind user32.SendMessageTimeoutW once, with 64-bit safe argtypes."""
+    import ctypes
+    from ctypes import wintypes
+    fn = ctypes.WinDLL("user32", use_last_error=True).SendMessageTimeoutW
+    fn.argtypes = [
+        wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPCWSTR,
+        wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_size_t),  # PDWORD_PTR
+    ]
+    fn.restype = ctypes.c_ssize_t  # LRESULT
+    return fn
+
+
+def _win_broadcast_env_change() -> None:
+    """Tell running programs (Explorer, new shells) the user environment changed.
+
+    Must stay a synchronous send: the async SendNotifyMessageW/PostMessageW
+    reject pointer parameters ("Environment") for system messages. The timeout
+    is per window, so keep it short; Explorer answers well within it.
+    """
+    try:
+        HWND_BROADCAST = 0xFFFF
+        WM_SETTINGCHANGE = 0x001A
+        SMTO_ABORTIFHUNG = 0x0002
+        _send_message_timeout_api()(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 500, None)
+    except Exception:
+        pass
+
+
 # --------------------------
 # Metadata
 # --------------------------
@@ -159,7 +293,11 @@ CONFIG_FILE = SCRIPT_DIR / "sofilab.conf"
 # Logging (Rotating)
 # --------------------------
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import MemoryHandler, RotatingFileHandler
+
+
+# max_log_size suffixes (binary units)
+_SIZE_MULT = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
 
 
 @dataclasses.dataclass
@@ -171,16 +309,116 @@ class GlobalConfig:
     max_log_files: int = 5
     script_exit_on_error: bool = True
     force_tty: bool = True
+    script_delay: float = 0.0  # seconds to pause between scripts in a set
+    ssh_backend: str = "paramiko"  # paramiko, or openssh (system ssh + ControlMaster) for run-only commands
+    sftp_max_requests: int = 64  # outstanding SFTP read requests per download (like sftp -R)
+    sftp_parallel: int = 4  # SFTP channels used at once for multi-file upload/download
+    sftp_write_size: int = 32 << 10  # bytes per SFTP WRITE request on upload (K suffix allowed)
+
+    # Parsed form of max_log_size; kept in sync by __setattr__ so parse_conf can
+    # keep assigning the raw string
+    _max_bytes: int = dataclasses.field(init=False, repr=False, compare=False, default=0)
+
+    @staticmethod
+    def _parse_size(value: str) -> int:
+        s = str(value).strip().upper()
+        mult = _SIZE_MULT.get(s[-1:])
+        return int(s[:-1]) * mult if mult else int(s)
+
+    def __setattr__(self, name, value) -> None:
+        object.__setattr__(self, name, value)
+        if name == "max_log_size":
+            try:
+                parsed = self._parse_size(value)
+            except ValueError:
+                parsed = -1  # invalid; reported by max_bytes() when logging needs it
+            object.__setattr__(self, "_max_bytes", parsed)
 
     def max_bytes(self) -> int:
-        s = self.max_log_size.strip().upper()
-        if s.endswith("G"):
-            return int(s[:-1]) * 1024 * 1024 * 1024
-        if s.endswith("M"):
-            return int(s[:-1]) * 1024 * 1024
-        if s.endswith("K"):
-            return int(s[:-1]) * 1024
-        return int(s)
+        if self._max_bytes < 0:
+            return self._parse_size(self.max_log_size)
+        return self._max_bytes
+
+
+class FastFormatter(logging.Formatter):
+    """Formats "[%(asctime)s] [%(levelname)s] %(message)s" with an f-string and a
+    timestamp prefix that is rebuilt only when the wall-clock second changes."""
+
+    def __init__(self) -> None:
+        super().__init__("[%(asctime)s] [%(levelname)s] %(message)s")
+        self._ts_sec = -1
+        self._ts_str = ""
+
+    def format(self, record) -> str:
+        # The formatted line is kept on the record: the main and error log
+        # handlers share this formatter, so an ERROR record is formatted once
+        line = record.__dict__.get("_sofilab_line")
+        if line is not None:
+            return line
+        if record.exc_info or record.exc_text or record.stack_info:
+            line = super().format(record)
+        else:
+            sec = int(record.created)
+            if sec != self._ts_sec:
+                self._ts_sec = sec
+                self._ts_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+            line = f"[{self._ts_str},{int(record.msecs):03d}] [{record.levelname}] {record.getMessage()}"
+        record._sofilab_line = line
+        return line
+
+
+class FastRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that keeps a running byte count instead of seeking and
+    stat-ing the log file on every record."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        try:
+            self._pos = os.path.getsize(self.baseFilename)
+        except OSError:
+            self._pos = 0
+        self._pending = 0
+
+    def shouldRollover(self, record) -> bool:
+        if self.maxBytes <= 0:
+            self._pending = 0
+            return False
+        msg = self.format(record)
+        # ASCII lines (the common case) are as long in bytes as in characters
+        n = len(msg) if msg.isascii() else len(msg.encode(self.encoding or "utf-8", errors="replace"))
+        self._pending = n + 1
+        return self._pos + self._pending >= self.maxBytes
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._pos = 0
+
+    def emit(self, record) -> None:
+        super().emit(record)
+        self._pos += self._pending
+
+
+class PeriodicMemoryHandler(MemoryHandler):
+    """MemoryHandler that also flushes on a fixed interval from a daemon thread,
+    so buffered records reach disk even when little is logged."""
+
+    def __init__(self, capacity: int, flushLevel: int, target: logging.Handler, interval: float = 30.0):
+        super().__init__(capacity, flushLevel=flushLevel, target=target)
+        self.interval = interval
+        self._stop = threading.Event()
+        t = threading.Thread(target=self._run, name="sofilab-log-flush", daemon=True)
+        t.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        self._stop.set()
+        super().close()
 
 
 MAIN_LOG: Optional[Path] = None
@@ -188,6 +426,76 @@ ERROR_LOG: Optional[Path] = None
 REMOTE_LOG: Optional[Path] = None
 
 
+class _RemoteLogWriter:
+    """Buffered append sink for remote script output.
+
+    One handle with a 1 MiB buffer stays open for the whole run instead of
+    reopening the file per line, so lines reach the disk in large writes. A
+    daemon thread flushes it every `interval` seconds (so a quiet run still
+    shows up in the file); flush_logs() and exit flush it too.
+    """
+
+    def __init__(self, interval: float = 30.0):
+        self.interval = interval
+        self._fh: Optional[io.TextIOWrapper] = None
+        self._path: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._ts_sec = -1
+        self._ts = ""
+
+    def _run_flusher(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def _timestamp(self) -> str:
+        # Reformat only when the wall-clock second changes
+        now = int(time.time())
+        if now != self._ts_sec:
+            self._ts_sec = now
+            self._ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        return self._ts
+
+    def write(self, path: Path, alias: str, script: str, lines: List[str]) -> None:
+        with self._lock:
+            if self._fh is None or self._path != path:
+                self._close()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = path.open("a", buffering=1 << 20, encoding="utf-8", errors="ignore")
+                self._path = path
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run_flusher, name="sofilab-remote-log-flush", daemon=True)
+                    self._flusher.start()
+            prefix = f"[{self._timestamp()}] [{alias}] [{script}] "
+            self._fh.write("".join(f"{prefix}{line}\n" for line in lines))
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                try:
+                    self._fh.flush()
+                except Exception:
+                    pass
+
+    def _close(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except Exception:
+                pass
+            self._fh = None
+            self._path = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+_REMOTE_WRITER = _RemoteLogWriter()
+atexit.register(_REMOTE_WRITER.close)
+
+
 def init_logging(cfg: GlobalConfig) -> None:
     global MAIN_LOG, ERROR_LOG, REMOTE_LOG
     if not cfg.enable_logging:
@@ -197,73 +505,119 @@ def init_logging(cfg: GlobalConfig) -> None:
     MAIN_LOG = cfg.log_dir / "sofilab.log"
     ERROR_LOG = cfg.log_dir / "sofilab-error.log"
     REMOTE_LOG = cfg.log_dir / "sofilab-remote.log"
+    _REMOTE_WRITER.close()  # reopened lazily by log_remote against the new path
 
     # Root logger setup
     root = logging.getLogger("sofilab")
     root.setLevel(getattr(logging, cfg.log_level.upper(), logging.INFO))
     root.handlers[:] = []
 
-    fmt = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
+    fmt = FastFormatter()
 
     if MAIN_LOG:
-        h_main = RotatingFileHandler(MAIN_LOG, maxBytes=cfg.max_bytes(), backupCount=cfg.max_log_files, encoding="utf-8")
+        h_main = FastRotatingFileHandler(MAIN_LOG, maxBytes=cfg.max_bytes(), backupCount=cfg.max_log_files, encoding="utf-8")
         h_main.setFormatter(fmt)
         h_main.setLevel(getattr(logging, cfg.log_level.upper(), logging.INFO))
-        root.addHandler(h_main)
+        # Buffer routine records; ERROR and above are written through immediately
+        # (logging's own atexit shutdown flushes whatever is left on a normal exit)
+        root.addHandler(PeriodicMemoryHandler(8192, logging.ERROR, h_main))
 
     # Separate error file
     if ERROR_LOG:
-        h_err = RotatingFileHandler(ERROR_LOG, maxBytes=cfg.max_bytes(), backupCount=cfg.max_log_files, encoding="utf-8")
+        h_err = FastRotatingFileHandler(ERROR_LOG, maxBytes=cfg.max_bytes(), backupCount=cfg.max_log_files, encoding="utf-8")
         h_err.setFormatter(fmt)
         h_err.setLevel(logging.ERROR)
         root.addHandler(h_err)
 
 
+def flush_logs() -> None:
+    for h in logging.getLogger("sofilab").handlers:
+        try:
+            h.flush()
+        except Exception:
+            pass
+    _REMOTE_WRITER.flush()
+
+
 def log_remote(alias: str, script: str, line: str) -> None:
-    global REMOTE_LOG
-    if REMOTE_LOG is None:
+    log_remote_batch(alias, script, [line])
+
+
+def log_remote_batch(alias: str, script: str, lines: List[str]) -> None:
+    """Append several remote output lines with one timestamp, lock and write."""
+    if REMOTE_LOG is None or not lines:
         return
     try:
-        REMOTE_LOG.parent.mkdir(parents=True, exist_ok=True)
-        with REMOTE_LOG.open("a", encoding="utf-8", errors="ignore") as f:
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"[{ts}] [{alias}] [{script}] {line}\n")
+        _REMOTE_WRITER.write(REMOTE_LOG, alias, script, lines)
     except Exception:
         pass
 
 
 log = logging.getLogger("sofilab")
+# Until init_logging attaches files (or when logging is disabled) records are
+# dropped here rather than echoed a second time by logging.lastResort
+log.addHandler(logging.NullHandler())
 
 
+# One write per message so lines from concurrent transfers/hosts do not interleave
 def info(msg: str) -> None:
-    print(f"💡 {msg}", file=sys.stderr)
+    sys.stderr.write(f"💡 {msg}\n")
     log.info(msg)
 
 
 def warn(msg: str) -> None:
-    print(f"⚠️  {msg}", file=sys.stderr)
+    sys.stderr.write(f"⚠️  {msg}\n")
     log.warning(msg)
 
 
 def error(msg: str) -> None:
-    print(f"❌ {msg}", file=sys.stderr)
+    sys.stderr.write(f"❌ {msg}\n")
     log.error(msg)
 
 
 def success(msg: str) -> None:
-    print(f"✅ {msg}", file=sys.stderr)
+    sys.stderr.write(f"✅ {msg}\n")
     log.info("SUCCESS: %s", msg)
 
 
 def progress(msg: str) -> None:
-    print(f"🔄 {msg}", file=sys.stderr)
+    sys.stderr.write(f"🔄 {msg}\n")
     log.info("PROGRESS: %s", msg)
 
 
 # --------------------------
 # Utilities
 # --------------------------
+# Per-process caches for DNS, SSH port probes and keyfile lookups; --no-cache
+# turns them off for runs where hosts move (e.g. during re-provisioning)
+LOOKUP_CACHE = True
+
+
+def disable_lookup_caches() -> None:
+    global LOOKUP_CACHE
+    LOOKUP_CACHE = False
+    _RESOLVE_CACHE.clear()
+    _PORT_CACHE.clear()
+
+
+# host -> (expires_at, ip); DNS rarely changes within one CLI run
+_RESOLVE_TTL = 5.0
+_RESOLVE_CACHE: Dict[str, Tuple[float, str]] = {}
+
+
 def resolve_host_ip(host: str) -> Optional[str]:
+    hit = _RESOLVE_CACHE.get(host) if LOOKUP_CACHE else None
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    ip = _resolve_host_ip(host)
+    if ip:
+        _RESOLVE_CACHE[host] = (time.monotonic() + _RESOLVE_TTL, ip)
+    else:
+        _RESOLVE_CACHE.pop(host, None)
+    return ip
+
+
+def _resolve_host_ip(host: str) -> Optional[str]:
     try:
         # Prefer IPv4 if possible
         for family in (socket.AF_INET, socket.AF_INET6):
@@ -278,29 +632,131 @@ def resolve_host_ip(host: str) -> Optional[str]:
     return None
 
 
+def _start_probe(host: str, port: int) -> Tuple[Optional[socket.socket], Optional[bool]]:
+    """Begin a non-blocking TCP connect: (socket, None) while pending, else
+    (None, True/False) when it already succeeded or failed."""
+    try:
+        family, socktype, proto, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+        s = socket.socket(family, socktype, proto)
+    except OSError:
+        return None, False
+    try:
+        s.setblocking(False)
+        rc = s.connect_ex(sockaddr)
+    except OSError:
+        s.close()
+        return None, False
+    if rc in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, "WSAEWOULDBLOCK", -1)):
+        return s, None
+    s.close()
+    return None, rc == 0
+
+
+def _finish_probe(s: socket.socket) -> bool:
+    """Result of a pending connect that select() reported ready; closes the socket."""
+    try:
+        return s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+
 def check_port_open(host: str, port: int, timeout: float = 3.0) -> bool:
+    """TCP connect probe. Non-blocking connect + select, so a refused port returns
+    as soon as the RST arrives and only filtered ports wait out `timeout`."""
+    s, ok = _start_probe(host, port)
+    if s is None:
+        return bool(ok)
     try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
+        _, w, x = select.select([], [s], [s], timeout)
     except OSError:
+        s.close()
         return False
+    if not w and not x:
+        s.close()
+        return False
+    return _finish_probe(s)
+
+
+def _probe_with_fallback(host: str, port: int, fallback: int, timeout: float = 3.0,
+                         head_start: float = 0.25) -> Tuple[bool, bool]:
+    """Probe port, and fallback only if port has not answered within head_start.
+
+    Returns (port_open, fallback_open); port's answer always wins, and the
+    fallback's socket is closed as soon as it does. A closed or filtered custom
+    port therefore costs about one timeout instead of two in a row, while a
+    custom port that answers promptly never causes a connect to the fallback.
+    No threads: both connects are driven from this one select loop.
+    """
+    pending: Dict[int, Tuple[socket.socket, float]] = {}
+    results: Dict[int, bool] = {}
+    s, ok = _start_probe(host, port)
+    if s is None:
+        results[port] = bool(ok)
+    else:
+        pending[port] = (s, time.monotonic())
+    fallback_started = False
+    try:
+        while True:
+            if results.get(port):
+                return True, False
+            now = time.monotonic()
+            if not fallback_started and (port in results or now - pending[port][1] >= head_start):
+                fallback_started = True
+                s, ok = _start_probe(host, fallback)
+                if s is None:
+                    results[fallback] = bool(ok)
+                else:
+                    pending[fallback] = (s, now)
+            if port in results and fallback in results:
+                return False, results[fallback]
+            # Time out whatever has waited its full timeout
+            for p_, (s, started) in list(pending.items()):
+                if now - started >= timeout:
+                    s.close()
+                    del pending[p_]
+                    results[p_] = False
+            if port in results and fallback in results:
+                return False, results[fallback]
+            if not pending:
+                continue
+            wait = min(started + timeout for _, started in pending.values()) - now
+            if not fallback_started:
+                wait = min(wait, pending[port][1] + head_start - now)
+            socks = [s for s, _ in pending.values()]
+            try:
+                _, w, x = select.select([], socks, socks, max(0.0, wait))
+            except OSError:
+                w, x = socks, []
+            ready = set(w) | set(x)
+            for p_, (s, _) in list(pending.items()):
+                if s in ready:
+                    del pending[p_]
+                    results[p_] = _finish_probe(s)
+    finally:
+        for s, _ in pending.values():
+            s.close()
+
+
+_SIZE_SUFFIXES = ('B', 'KB', 'MB', 'GB', 'TB')
 
 
 def human_size(nbytes: int) -> str:
-    suffixes = ['B', 'KB', 'MB', 'GB', 'TB']
-    i = 0
-    f = float(nbytes)
-    while f >= 1024 and i < len(suffixes) - 1:
-        f /= 1024.0
-        i += 1
-    if i == 0:
-        return f"{int(f)}{suffixes[i]}"
-    return f"{f:.1f}{suffixes[i]}"
+    n = int(nbytes)
+    if n < 1024:
+        return f"{n}B"
+    # Power-of-1024 bucket straight from the bit length instead of dividing in a loop
+    i = min((n.bit_length() - 1) // 10, len(_SIZE_SUFFIXES) - 1)
+    return f"{n / (1 << (10 * i)):.1f}{_SIZE_SUFFIXES[i]}"
 
 
 # --------------------------
 # Config parsing
 # --------------------------
+_UNSET = object()
+
+
 @dataclasses.dataclass
 class ServerConfig:
     aliases: List[str]
@@ -313,11 +769,95 @@ class ServerConfig:
     scripts: List[str] = dataclasses.field(default_factory=list)
     script_args_map: Dict[str, List[str]] = dataclasses.field(default_factory=dict)
     default_script_args: List[str] = dataclasses.field(default_factory=list)
+    verify_uploads: bool = False  # compare sha256 of each uploaded script with the local file
+    # Per-process lookup result (see get_ssh_keyfile); not part of the config
+    _keyfile: object = dataclasses.field(default=_UNSET, repr=False, compare=False)
+
+
+def _split_scripts(s: str) -> List[Tuple[str, List[str]]]:
+    """Split a scripts="a.sh x, b.sh 'y z'" value into (name, args) pairs in one pass.
+
+    Top-level commas separate entries and whitespace separates words; quoting and
+    backslash escapes follow shlex (POSIX) rules, so a quoted comma stays in its
+    argument. An unterminated quote runs to the end of the string.
+    """
+    items: List[Tuple[str, List[str]]] = []
+    words: List[str] = []
+    buf: List[str] = []
+    started = False  # distinguishes an empty quoted word ('') from no word
+    quote = ""
+    i, n = 0, len(s)
+    while i < n:
+        c = s[i]
+        if quote == "'":
+            if c == "'":
+                quote = ""
+            else:
+                buf.append(c)
+        elif quote == '"':
+            if c == '"':
+                quote = ""
+            elif c == "\\" and i + 1 < n and s[i + 1] in '"\\':
+                i += 1
+                buf.append(s[i])
+            else:
+                buf.append(c)
+        elif c == "\\":
+            if i + 1 < n:
+                i += 1
+                buf.append(s[i])
+            started = True
+        elif c == "'" or c == '"':
+            quote = c
+            started = True
+        elif c == "," or c.isspace():
+            if started or buf:
+                words.append("".join(buf))
+                buf = []
+                started = False
+            if c == "," and words:
+                items.append((words[0], words[1:]))
+                words = []
+        else:
+            buf.append(c)
+            started = True
+        i += 1
+    if started or buf:
+        words.append("".join(buf))
+    if words:
+        items.append((words[0], words[1:]))
+    return items
+
+
+_QUOTES = frozenset("\"'")
+
+
+def _strip_inline_comment(val: str) -> str:
+    """Drop a trailing `# comment` that starts after whitespace, outside quotes.
+
+    A `#` inside a quoted value or glued to text (e.g. pa#ss) is kept.
+    """
+    if "#" not in val:
+        return val
+    quote = None
+    for i, ch in enumerate(val):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in _QUOTES:
+            quote = ch
+        elif ch == "#" and i > 0 and val[i - 1] in " \t":
+            return val[:i].rstrip()
+    return val
 
 
 def parse_conf(path: Path) -> Tuple[GlobalConfig, Dict[str, ServerConfig]]:
-    if not path.exists():
-        raise FileNotFoundError(errno.ENOENT, "Configuration file not found", str(path))
+    # One open + read + decode of the raw bytes (no separate exists() stat and no
+    # incremental text-mode decoding)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(errno.ENOENT, "Configuration file not found", str(path)) from None
 
     gcfg = GlobalConfig()
     servers: Dict[str, ServerConfig] = {}
@@ -343,24 +883,14 @@ def parse_conf(path: Path) -> Tuple[GlobalConfig, Dict[str, ServerConfig]]:
             port = 22
         keyfile = acc.get("keyfile", "").strip()
         scripts_s = acc.get("scripts", "").strip()
-        scripts = [s.strip() for s in scripts_s.split(',') if s.strip()] if scripts_s else []
-
         # Support inline args inside scripts entries, e.g.:
         # scripts="foo.sh --x 1, bar.sh 'arg with space'"
         inline_args_map: Dict[str, List[str]] = {}
-        normalized_scripts: List[str] = []
-        for item in scripts:
-            try:
-                parts = shlex.split(item)
-            except Exception:
-                parts = [p for p in item.split() if p]
-            if not parts:
-                continue
-            name = parts[0]
-            if len(parts) > 1:
-                inline_args_map[name] = parts[1:]
-            normalized_scripts.append(name)
-        scripts = normalized_scripts
+        scripts: List[str] = []
+        for name, args in _split_scripts(scripts_s):
+            if args:
+                inline_args_map[name] = args
+            scripts.append(name)
 
         # Parse script args from keys like script_args.<script>="arg1 arg2" and default_script_args
         script_args_map: Dict[str, List[str]] = {}
@@ -384,68 +914,93 @@ def parse_conf(path: Path) -> Tuple[GlobalConfig, Dict[str, ServerConfig]]:
             if _n not in script_args_map:
                 script_args_map[_n] = _a
 
-        sc = ServerConfig(section_aliases, host, user, password, port, keyfile, scripts, script_args_map, default_script_args)
+        verify_uploads = acc.get("verify_uploads", "").strip().lower() == "true"
+        sc = ServerConfig(section_aliases, host, user, password, port, keyfile, scripts, script_args_map, default_script_args,
+                          verify_uploads=verify_uploads)
         for a in section_aliases:
             servers[a] = sc
 
-    with path.open("r", encoding="utf-8", errors="ignore") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line or line.startswith('#'):
-                continue
-
-            m = re.match(r"^\[(.+)\]$", line)
-            if m:
-                # flush previous
-                if section == "global":
-                    pass  # nothing to flush
-                else:
-                    flush_server()
-                section = m.group(1).strip()
-                if section.lower() == "global":
-                    section = "global"
-                    section_aliases = []
-                    acc = {}
-                else:
-                    section_aliases = [a.strip() for a in section.split(',') if a.strip()]
-                    acc = {}
-                continue
-
-            # key=value
-            kv = re.match(r"^([^=]+)=(.*)$", line)
-            if not kv or section is None:
-                continue
+    # Config files are small: decode once, then strip/skip comments in one pass
+    text = data.decode("utf-8", errors="ignore")
+    lines = [ln for ln in (raw.strip() for raw in text.splitlines()) if ln and ln[0] != '#']
+    for line in lines:
+        # [section] header; plain slicing, no regex per line
+        if line[0] == '[' and line[-1] == ']' and len(line) > 2:
+            # flush previous
+            if section == "global":
+                pass  # nothing to flush
+            else:
+                flush_server()
+            section = line[1:-1].strip()
+            if section.lower() == "global":
+                section = "global"
+                section_aliases = []
+                acc = {}
+            else:
+                section_aliases = [a.strip() for a in section.split(',') if a.strip()]
+                acc = {}
+            continue
 
-            key = kv.group(1).strip()
-            val = kv.group(2).strip()
-            # remove optional quotes
-            if len(val) >= 2 and ((val[0] == '"' and val[-1] == '"') or (val[0] == "'" and val[-1] == "'")):
-                val = val[1:-1]
+        # key=value
+        key, sep, val = line.partition('=')
+        if not sep or not key or section is None:
+            continue
 
-            if section == "global":
-                if key == "log_dir":
-                    p = Path(val)
-                    gcfg.log_dir = p if p.is_absolute() else (SCRIPT_DIR / p)
-                elif key == "log_level":
-                    if val.upper() in {"DEBUG", "INFO", "WARN", "ERROR"}:
-                        gcfg.log_level = val.upper()
-                elif key == "enable_logging":
-                    gcfg.enable_logging = val.lower() == "true"
-                elif key == "max_log_size":
-                    gcfg.max_log_size = val
-                elif key == "max_log_files":
-                    try:
-                        gcfg.max_log_files = max(1, int(val))
-                    except ValueError:
-                        pass
-                elif key == "script_exit_on_error":
-                    gcfg.script_exit_on_error = val.lower() == "true"
-                elif key == "force_tty":
-                    gcfg.force_tty = val.lower() == "true"
+        key = key.strip()
+        val = _strip_inline_comment(val.strip())
+        # remove optional quotes
+        if len(val) >= 2 and val[0] in _QUOTES and val[-1] == val[0]:
+            val = val[1:-1]
+
+        if section == "global":
+            if key == "log_dir":
+                p = Path(val)
+                gcfg.log_dir = p if p.is_absolute() else (SCRIPT_DIR / p)
+            elif key == "log_level":
+                if val.upper() in {"DEBUG", "INFO", "WARN", "ERROR"}:
+                    gcfg.log_level = val.upper()
+            elif key == "enable_logging":
+                gcfg.enable_logging = val.lower() == "true"
+            elif key == "max_log_size":
+                gcfg.max_log_size = val
+            elif key == "max_log_files":
+                try:
+                    gcfg.max_log_files = max(1, int(val))
+                except ValueError:
+                    pass
+            elif key == "script_exit_on_error":
+                gcfg.script_exit_on_error = val.lower() == "true"
+            elif key == "force_tty":
+                gcfg.force_tty = val.lower() == "true"
+            elif key == "script_delay":
+                try:
+                    gcfg.script_delay = max(0.0, float(val))
+                except ValueError:
+                    pass
+            elif key == "ssh_backend":
+                if val.lower() in {"paramiko", "openssh"}:
+                    gcfg.ssh_backend = val.lower()
                 else:
-                    warn(f"Unknown global configuration key: {key}")
+                    warn(f"Unknown ssh_backend '{val}' (expected paramiko or openssh)")
+            elif key == "sftp_max_requests":
+                try:
+                    gcfg.sftp_max_requests = max(1, int(val))
+                except ValueError:
+                    pass
+            elif key == "sftp_parallel":
+                try:
+                    gcfg.sftp_parallel = max(1, int(val))
+                except ValueError:
+                    pass
+            elif key == "sftp_write_size":
+                try:
+                    gcfg.sftp_write_size = min(max(1024, GlobalConfig._parse_size(val)), _SFTP_WRITE_SIZE_MAX)
+                except ValueError:
+                    pass
             else:
-                acc[key] = val
+                warn(f"Unknown global configuration key: {key}")
+        else:
+            acc[key] = val
 
     # flush last
     if section != "global":
@@ -457,6 +1012,136 @@ def parse_conf(path: Path) -> Tuple[GlobalConfig, Dict[str, ServerConfig]]:
 # --------------------------
 # SSH/Paramiko helpers
 # --------------------------
+# (path, mtime) -> parsed private key, or None if it needs a passphrase/is unreadable
+_PKEY_CACHE: Dict[Tuple[str, float], Optional[object]] = {}
+
+
+def _load_key(path: Path) -> Optional[object]:
+    """Parse a private key once per run; None means use the key_filename flow instead."""
+    try:
+        cache_key = (str(path), path.stat().st_mtime)
+    except OSError:
+        return None
+    if cache_key in _PKEY_CACHE:
+        return _PKEY_CACHE[cache_key]
+    paramiko = ensure_paramiko()
+    pkey = None
+    for cls_name in ("Ed25519Key", "RSAKey", "ECDSAKey"):
+        cls = getattr(paramiko, cls_name, None)
+        if cls is None:
+            continue
+        try:
+            pkey = cls.from_private_key_file(str(path))
+            break
+        except Exception:
+            continue
+    _PKEY_CACHE[cache_key] = pkey
+    return pkey
+
+
+_SOCK_BUF_BYTES = 32 << 20
+# Per-channel receive window; paramiko re-advertises it as we consume data, so a
+# large value only matters on high bandwidth-delay links where it lifts the cap
+# of one window per round trip (4 MiB at 100 ms RTT is ~40 MB/s)
+_SSH_WINDOW_BYTES = 1 << 27
+_SSH_MAX_PACKET = 256 << 10
+_SFTP_CHUNK = 1 << 20
+# Payload per SFTP WRITE request. 32 KiB is the size the SFTP draft requires every
+# server to accept; larger requests (OpenSSH's sftp-server takes messages up to
+# 256 KiB) are opt-in via [global] sftp_write_size, set in main(). Reads stay at
+# paramiko's 32 KiB because older sftp-servers cap reads at 64 KiB.
+SFTP_WRITE_SIZE = 32 << 10
+_SFTP_WRITE_SIZE_MAX = 255 << 10
+# Outstanding SFTP read requests during downloads (sftp(1) -R default); set from
+# [global] sftp_max_requests in main()
+SFTP_MAX_REQUESTS = 64
+# SFTP channels per multi-file transfer; set from [global] sftp_parallel in main()
+SFTP_PARALLEL = 4
+# Seconds an SFTP channel may go without any response before the transfer fails
+# (a dead link otherwise blocks a pipelined get/put forever)
+_SFTP_IO_TIMEOUT = 120.0
+
+
+@functools.lru_cache(maxsize=None)
+def _sock_buf_cap(name: str) -> Optional[int]:
+    """Linux net.core.<name> (rmem_max/wmem_max), or None where unknown."""
+    try:
+        with open(f"/proc/sys/net/core/{name}") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _tuned_socket(host: str, port: int, timeout: float) -> socket.socket:
+    """Connect a TCP socket with Nagle disabled and large buffers for Paramiko to use.
+
+    Large buffers keep SFTP/shell streams from being window-limited on high-RTT
+    links. They are set before connect() so the SYN advertises a matching window
+    scale, and skipped where the kernel would clamp them: a fixed SO_RCVBUF
+    turns off receive autotuning, which beats a small clamped buffer. A failed
+    connect raises its OSError rather than letting Paramiko dial (and wait) again.
+    """
+    opts = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+    for opt, cap in ((socket.SO_SNDBUF, "wmem_max"), (socket.SO_RCVBUF, "rmem_max")):
+        limit = _sock_buf_cap(cap)
+        if limit is None or limit >= _SOCK_BUF_BYTES:
+            opts.append((socket.SOL_SOCKET, opt, _SOCK_BUF_BYTES))
+    last_err: Optional[OSError] = None
+    for family, kind, proto, _, addr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        sock = socket.socket(family, kind, proto)
+        for level, opt, val in opts:
+            try:
+                sock.setsockopt(level, opt, val)
+            except OSError:
+                pass
+        try:
+            sock.settimeout(timeout)
+            sock.connect(addr)
+            return sock
+        except OSError as e:
+            sock.close()
+            last_err = e
+    raise last_err or OSError(f"No addresses found for {host}:{port}")
+
+
+# Per-recv read size when streaming remote output; large reads drain a full SSH
+# window in a few calls
+RECV_CHUNK = 256 * 1024
+
+
+def _stdout_is_tty() -> bool:
+    try:
+        return sys.stdout.isatty()
+    except Exception:
+        return False
+
+
+# Piped/redirected output (CI, log files) lets the buffered writer batch chunks
+IS_TTY = _stdout_is_tty()
+
+
+def _write_raw(data: bytes, flush: bool = True) -> None:
+    """Pass remote terminal bytes through undecoded (no split UTF-8/escape sequences)."""
+    out = getattr(sys.stdout, "buffer", None)
+    if out is None:
+        sys.stdout.write(data.decode(errors="ignore"))
+        sys.stdout.flush()
+        return
+    out.write(data)
+    if flush:
+        out.flush()
+
+
+def _win_console_input(limit: int = 4096) -> bytes:
+    """Drain every keystroke already queued on the Windows console as one UTF-8 chunk,
+    so a paste or key-repeat burst goes out in one channel send, not one per char."""
+    import msvcrt
+    chars: List[str] = []
+    while len(chars) < limit and msvcrt.kbhit():
+        chars.append(msvcrt.getwch())
+    return "".join(chars).encode("utf-8", "surrogatepass") if chars else b""
+
+
 class SSHClient:
     def __init__(self, host: str, port: int, username: str, password: str = "", key_path: Optional[Path] = None):
         self.host = host
@@ -466,6 +1151,11 @@ class SSHClient:
         self.key_path = key_path
         self.client: Optional[object] = None
         self.transport: Optional[object] = None
+        # Remote shell ("bash"/"sh") once detected on this connection
+        self.remote_shell: Optional[str] = None
+        # Pooled connections are reused across actions; keepalives stop idle NAT/
+        # firewall state from expiring between them
+        self.keep_alive = True
 
     def connect(self, timeout: float = 5.0) -> None:
         paramiko = ensure_paramiko()
@@ -477,38 +1167,75 @@ class SSHClient:
         if self.key_path and self.key_path.exists():
             key_filename = str(self.key_path)
 
-        # Try agent/keys first without prompting for passphrases
-        try:
-            c.connect(
-                hostname=self.host,
-                port=self.port,
-                username=self.username,
-                password=None,
-                key_filename=key_filename,
-                look_for_keys=True,
-                allow_agent=True,
-                timeout=timeout,
-                auth_timeout=timeout,
-                banner_timeout=timeout,
-            )
-        except paramiko.AuthenticationException:
-            # Fallback to password auth if provided (do not prompt for key passphrase)
-            if self.password:
+        # Known key: offer only that key (no ~/.ssh scan or agent identities, each an
+        # extra auth round trip); on rejection fall through to the discovery flow
+        pkey = _load_key(self.key_path) if key_filename else None
+        connected = False
+        if pkey is not None:
+            try:
                 c.connect(
                     hostname=self.host,
                     port=self.port,
                     username=self.username,
-                    password=self.password,
+                    pkey=pkey,
+                    sock=_tuned_socket(self.host, self.port, timeout),
                     look_for_keys=False,
+                    allow_agent=False,
+                    timeout=timeout,
+                    auth_timeout=timeout,
+                    banner_timeout=timeout,
+                    compress=False,
+                )
+                connected = True
+            except paramiko.AuthenticationException:
+                c.close()
+
+        if not connected:
+            # Try agent/keys first without prompting for passphrases
+            try:
+                c.connect(
+                    hostname=self.host,
+                    port=self.port,
+                    username=self.username,
+                    password=None,
+                    key_filename=key_filename,
+                    sock=_tuned_socket(self.host, self.port, timeout),
+                    look_for_keys=True,
                     allow_agent=True,
                     timeout=timeout,
                     auth_timeout=timeout,
                     banner_timeout=timeout,
+                    compress=False,
                 )
-            else:
-                raise
+            except paramiko.AuthenticationException:
+                # Fallback to password auth if provided (do not prompt for key passphrase)
+                if self.password:
+                    c.connect(
+                        hostname=self.host,
+                        port=self.port,
+                        username=self.username,
+                        password=self.password,
+                        sock=_tuned_socket(self.host, self.port, timeout),
+                        look_for_keys=False,
+                        allow_agent=True,
+                        timeout=timeout,
+                        auth_timeout=timeout,
+                        banner_timeout=timeout,
+                        compress=False,
+                    )
+                else:
+                    raise
         self.client = c
         self.transport = c.get_transport()
+        # Bigger windows/packets for channels opened from here on (SFTP, exec, shell)
+        # so transfers are not capped at one small window per round trip
+        try:
+            self.transport.default_window_size = _SSH_WINDOW_BYTES
+            self.transport.default_max_packet_size = _SSH_MAX_PACKET
+            if self.keep_alive:
+                self.transport.set_keepalive(30)
+        except Exception:
+            pass
 
     def close(self) -> None:
         try:
@@ -517,6 +1244,7 @@ class SSHClient:
         finally:
             self.client = None
             self.transport = None
+            self.remote_shell = None
 
     def run(self, command: str, env: Optional[Dict[str, str]] = None, get_pty: bool = False, timeout: Optional[float] = None) -> Tuple[int, str, str]:
         assert self.client is not None, "SSH not connected"
@@ -528,31 +1256,46 @@ class SSHClient:
             for k, v in env.items():
                 chan.update_environment({k: v})
         chan.exec_command(command)
-        stdout = io.BytesIO()
-        stderr = io.BytesIO()
+        stdout: List[bytes] = []
+        stderr: List[bytes] = []
         start = time.time()
-        while True:
-            if chan.recv_ready():
-                stdout.write(chan.recv(32768))
-            if chan.recv_stderr_ready():
-                stderr.write(chan.recv_stderr(32768))
-            if chan.exit_status_ready():
-                # flush remaining
+        # The channel's fileno() becomes readable when stdout or stderr data (or EOF)
+        # arrives, so block on it instead of polling
+        sel = selectors.DefaultSelector()
+        sel.register(chan, selectors.EVENT_READ)
+        try:
+            while True:
+                # Drain whatever is buffered on each wake-up, in large reads
                 while chan.recv_ready():
-                    stdout.write(chan.recv(32768))
+                    stdout.append(chan.recv(RECV_CHUNK))
                 while chan.recv_stderr_ready():
-                    stderr.write(chan.recv_stderr(32768))
-                break
-            if timeout is not None and (time.time() - start) > timeout:
-                chan.close()
-                break
-            time.sleep(0.01)
+                    stderr.append(chan.recv_stderr(RECV_CHUNK))
+                if chan.exit_status_ready():
+                    # flush remaining
+                    while chan.recv_ready():
+                        stdout.append(chan.recv(RECV_CHUNK))
+                    while chan.recv_stderr_ready():
+                        stderr.append(chan.recv_stderr(RECV_CHUNK))
+                    break
+                # Safety cap only: data, EOF and close all wake the selector
+                wait = 0.5
+                if timeout is not None:
+                    remaining = timeout - (time.time() - start)
+                    if remaining <= 0:
+                        chan.close()
+                        break
+                    wait = min(wait, remaining)
+                sel.select(wait)
+        finally:
+            sel.close()
         code = chan.recv_exit_status()
-        return code, stdout.getvalue().decode(errors="ignore"), stderr.getvalue().decode(errors="ignore")
+        return code, b"".join(stdout).decode(errors="ignore"), b"".join(stderr).decode(errors="ignore")
 
     def sftp(self):
         assert self.client is not None, "SSH not connected"
-        return self.client.open_sftp()
+        sftp = self.client.open_sftp()
+        sftp.get_channel().settimeout(_SFTP_IO_TIMEOUT)
+        return sftp
 
     def interactive_shell(self) -> None:
         """Interactive shell bridging local TTY <-> remote PTY.
@@ -581,31 +1324,28 @@ class SSHClient:
 
         if os.name == 'nt':
             # Windows: use msvcrt for keyboard input, and a loop for channel
-            import threading, msvcrt
+            import threading
 
             stop = False
 
             def reader():
                 while not stop:
-                    data = chan.recv(32768)
+                    data = chan.recv(65536)
                     if not data:
                         break
-                    sys.stdout.write(data.decode(errors="ignore"))
-                    sys.stdout.flush()
+                    _write_raw(data)
 
             t = threading.Thread(target=reader, daemon=True)
             t.start()
             try:
                 while True:
-                    if msvcrt.kbhit():
-                        ch = msvcrt.getwch()
-                        if ch == '\r':
-                            chan.send("\r")
-                        else:
-                            chan.send(ch.encode('utf-8'))
-                    if chan.exit_status_ready():
+                    data = _win_console_input()
+                    if data:
+                        chan.sendall(data)
+                    # Console input cannot be selected on; wait on the channel's
+                    # status event instead so exit is noticed immediately
+                    if chan.status_event.wait(0.01) or chan.exit_status_ready():
                         break
-                    time.sleep(0.01)
             except KeyboardInterrupt:
                 pass
             finally:
@@ -643,11 +1383,10 @@ class SSHClient:
                 while True:
                     rlist, _, _ = select.select([chan, sys.stdin], [], [])
                     if chan in rlist:
-                        data = chan.recv(32768)
+                        data = chan.recv(65536)
                         if not data:
                             break
-                        sys.stdout.write(data.decode(errors="ignore"))
-                        sys.stdout.flush()
+                        _write_raw(data)
                     if sys.stdin in rlist:
                         try:
                             data = os.read(fd, 1024)
@@ -673,17 +1412,189 @@ class SSHClient:
                     pass
 
 
-# --------------------------
-# Core features
-# --------------------------
+def _ssh_mux_opts() -> List[str]:
+    """OpenSSH ControlMaster options shared by OpenSSHClient and hook scripts
+    (exported as SOFILAB_SSH_MUX_OPTS); SOFILAB_DISABLE_SSH_MUX=1 turns them off."""
+    if os.environ.get("SOFILAB_DISABLE_SSH_MUX") == "1":
+        return []
+    # ssh will not create the ControlPath's directory itself
+    try:
+        (Path.home() / ".ssh").mkdir(mode=0o700, exist_ok=True)
+    except OSError:
+        pass
+    return ["-o", "ControlMaster=auto", "-o", "ControlPath=~/.ssh/sofilab-%C", "-o", "ControlPersist=600"]
+
+
+class OpenSSHClient(SSHClient):
+    """SSHClient.run() over the system OpenSSH client with connection
+    multiplexing (ControlMaster), so repeated commands reuse one authenticated
+    master connection that persists for 10 minutes between CLI invocations.
+
+    Key/agent auth only (BatchMode); no SFTP or channel access. Used for
+    run-only commands when ssh_backend="openssh".
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str = "", key_path: Optional[Path] = None):
+        super().__init__(host, port, username, password, key_path)
+        self.keep_alive = False
+
+    def _base_argv(self, timeout: float) -> List[str]:
+        argv = [
+            "ssh", "-p", str(self.port),
+            "-o", "BatchMode=yes",
+            "-o", "StrictHostKeyChecking=accept-new",
+            "-o", f"ConnectTimeout={max(1, int(timeout))}",
+            *_ssh_mux_opts(),
+        ]
+        if self.key_path and self.key_path.exists():
+            argv += ["-i", str(self.key_path), "-o", "IdentitiesOnly=yes"]
+        return argv + [f"{self.username}@{self.host}"]
+
+    def connect(self, timeout: float = 5.0) -> None:
+        # Opens (or reuses) the master connection; fails fast if key auth does not work
+        code, _out, err = self.run("true", timeout=timeout + 10)
+        if code != 0:
+            raise ConnectionError(err.strip() or f"ssh exited with {code}")
+
+    def run(self, command: str, env: Optional[Dict[str, str]] = None, get_pty: bool = False, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        argv = self._base_argv(timeout or 5.0)
+        if get_pty:
+            argv.insert(1, "-tt")
+        if env:
+            command = "env " + " ".join(shlex.quote(f"{k}={v}") for k, v in env.items()) + " " + command
+        try:
+            cp = subprocess.run(argv + [command], stdin=subprocess.DEVNULL, capture_output=True,
+                                timeout=timeout, close_fds=False)
+        except subprocess.TimeoutExpired:
+            return -1, "", "timed out"
+        return cp.returncode, cp.stdout.decode(errors="ignore"), cp.stderr.decode(errors="ignore")
+
+    def close(self) -> None:
+        # The master keeps running (ControlPersist) for the next command
+        self.remote_shell = None
+
+
+# Set from [global] ssh_backend in main()
+SSH_BACKEND = "paramiko"
+
+
+def _openssh_available() -> bool:
+    return os.name != "nt" and shutil.which("ssh") is not None
+
+
+# --------------------------
+# Core features
+# --------------------------
+class SSHPool:
+    """Connected SSHClients shared per (host, port, user, credentials) for the life of the process.
+
+    Callers get() a client and release() it when done; released clients stay
+    connected so the next action against the same server skips TCP+KEX+auth.
+    Dead transports are dropped and reconnected on the next get().
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[str, int, str, bool, str], SSHClient] = {}
+        self._refs: Dict[Tuple[str, int, str, bool, str], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(host: str, port: int, username: str, password: str, key_path: Optional[Path]) -> Tuple[str, int, str, bool, str]:
+        # The offered credentials are part of the key, so a client that logged in
+        # with the password never answers a key-only request (server_status's check)
+        return (host, port, username, bool(password), str(key_path or ""))
+
+    @staticmethod
+    def _alive(cli: SSHClient) -> bool:
+        t = cli.transport
+        return t is not None and t.is_active()  # type: ignore[attr-defined]
+
+    def get(self, host: str, port: int, username: str, password: str = "", key_path: Optional[Path] = None, timeout: float = 5.0) -> SSHClient:
+        key = self._key(host, port, username, password, key_path)
+        with self._lock:
+            cli = self._clients.get(key)
+            if cli is not None:
+                if self._alive(cli):
+                    self._refs[key] = self._refs.get(key, 0) + 1
+                    return cli
+                self._clients.pop(key, None)
+                self._refs.pop(key, None)
+        # Connect outside the lock so one slow host does not block the others
+        cli = SSHClient(host, port, username, password, key_path)
+        cli.connect(timeout=timeout)
+        with self._lock:
+            self._clients[key] = cli
+            self._refs[key] = self._refs.get(key, 0) + 1
+        return cli
+
+    def release(self, cli: SSHClient) -> None:
+        key = self._key(cli.host, cli.port, cli.username, cli.password, cli.key_path)
+        with self._lock:
+            if self._clients.get(key) is not cli:
+                drop = True
+            else:
+                self._refs[key] = max(0, self._refs.get(key, 1) - 1)
+                drop = not self._alive(cli)
+                if drop:
+                    self._clients.pop(key, None)
+                    self._refs.pop(key, None)
+        if drop:
+            cli.close()
+
+    def discard(self, cli: SSHClient) -> None:
+        """Close a client and forget it, e.g. after a reboot command."""
+        key = self._key(cli.host, cli.port, cli.username, cli.password, cli.key_path)
+        with self._lock:
+            if self._clients.get(key) is cli:
+                self._clients.pop(key, None)
+                self._refs.pop(key, None)
+        cli.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._refs.clear()
+        for cli in clients:
+            try:
+                cli.close()
+            except Exception:
+                pass
+
+
+SSH_POOL = SSHPool()
+atexit.register(SSH_POOL.close_all)
+
+
+# (host, configured_port) -> port that answered; one probe per host per CLI run
+_PORT_CACHE: Dict[Tuple[str, int], int] = {}
+
+
 def determine_ssh_port(configured_port: int, host: str) -> Optional[int]:
+    key = (host, configured_port)
+    port = _PORT_CACHE.get(key) if LOOKUP_CACHE else None
+    if port is not None:
+        return port
+    port = _determine_ssh_port(configured_port, host)
+    if port is not None and LOOKUP_CACHE:
+        _PORT_CACHE[key] = port
+    return port
+
+
+def _determine_ssh_port(configured_port: int, host: str) -> Optional[int]:
     display_host = host
     rip = resolve_host_ip(host)
     if rip and rip != host:
         display_host = f"{host} ({rip})"
 
+    # Probe the resolved address so each check is not another DNS lookup
+    target = rip or host
     progress(f"Checking connection to {display_host}:{configured_port}...")
-    if check_port_open(host, configured_port):
+    if configured_port == 22:
+        configured_open, fallback_open = check_port_open(target, 22), False
+    else:
+        configured_open, fallback_open = _probe_with_fallback(target, configured_port, 22)
+    if configured_open:
         if configured_port == 22:
             info("Port 22 is open (default SSH port)")
         else:
@@ -692,7 +1603,7 @@ def determine_ssh_port(configured_port: int, host: str) -> Optional[int]:
 
     if configured_port != 22:
         progress(f"Port {configured_port} not accessible, trying fallback port 22...")
-        if check_port_open(host, 22):
+        if fallback_open:
             info("Port 22 is open (fallback to default SSH port)")
             return 22
         error(f"Neither port {configured_port} nor port 22 are accessible")
@@ -703,20 +1614,30 @@ def determine_ssh_port(configured_port: int, host: str) -> Optional[int]:
 
 
 def get_ssh_keyfile(sc: ServerConfig) -> Optional[Path]:
+    # Probed once per ServerConfig; several actions in one run reuse the result
+    if LOOKUP_CACHE and sc._keyfile is not _UNSET:
+        p = sc._keyfile
+    else:
+        p = _find_ssh_keyfile(sc)
+        sc._keyfile = p
+    if p:
+        info(f"Using SSH key: {p}")
+    return p  # type: ignore[return-value]
+
+
+def _find_ssh_keyfile(sc: ServerConfig) -> Optional[Path]:
     # Explicit keyfile
     if sc.keyfile:
         p = Path(sc.keyfile)
         if not p.is_absolute():
             p = SCRIPT_DIR / p
         if p.exists():
-            info(f"Using SSH key: {p}")
             return p
 
     # Auto-detect ssh/<alias>_key
     for alias in sc.aliases:
         p = SCRIPT_DIR / "ssh" / f"{alias}_key"
         if p.exists():
-            info(f"Using SSH key: {p}")
             return p
     return None
 
@@ -753,12 +1674,19 @@ def server_status(sc: ServerConfig, alias: str, port_override: Optional[int] = N
     auth_ok = False
     # Try key
     try:
-        cli = SSHClient(sc.host, port_to_check, sc.user, key_path=keyfile)
-        cli.connect(timeout=5)
+        if SSH_BACKEND == "openssh" and _openssh_available():
+            cli = OpenSSHClient(sc.host, port_to_check, sc.user, key_path=keyfile)
+            try:
+                cli.connect(timeout=5)
+            except Exception:
+                cli = SSH_POOL.get(sc.host, port_to_check, sc.user, key_path=keyfile)
+        else:
+            cli = SSH_POOL.get(sc.host, port_to_check, sc.user, key_path=keyfile)
         auth_ok = True
         print("🔐 Auth: SSH key works")
         # also try a simple command
         code, out, _ = cli.run("uname -a && uptime", timeout=5)
+        out = out.strip()
         if code == 0 and out:
             success("Retrieved basic system info")
             for ln in out.splitlines():
@@ -767,21 +1695,20 @@ def server_status(sc: ServerConfig, alias: str, port_override: Optional[int] = N
         pass
     finally:
         try:
-            cli.close()  # type: ignore
+            SSH_POOL.release(cli)  # type: ignore
         except Exception:
             pass
 
     if not auth_ok and sc.password:
         try:
-            cli = SSHClient(sc.host, port_to_check, sc.user, password=sc.password)
-            cli.connect(timeout=5)
+            cli = SSH_POOL.get(sc.host, port_to_check, sc.user, password=sc.password)
             auth_ok = True
             print("🔐 Auth: Password works")
         except Exception:
             pass
         finally:
             try:
-                cli.close()  # type: ignore
+                SSH_POOL.release(cli)  # type: ignore
             except Exception:
                 pass
 
@@ -807,10 +1734,8 @@ def router_webui(sc: ServerConfig, action: str) -> int:
     if not use_port:
         return 1
 
-    keyfile = get_ssh_keyfile(sc)
     try:
-        cli = SSHClient(sc.host, use_port, sc.user, sc.password, keyfile)
-        cli.connect(timeout=5)
+        cli = get_run_client(sc, use_port)
     except Exception as e:
         error(f"SSH connection failed: {e}")
         return 1
@@ -850,25 +1775,52 @@ def router_webui(sc: ServerConfig, action: str) -> int:
         success("Web UI setting updated and httpd restarted")
         return 0
     finally:
+        SSH_POOL.release(cli)
+
+def get_or_connect(sc: ServerConfig, port: int) -> SSHClient:
+    """Pooled, authenticated client for a server; release it with SSH_POOL.release()."""
+    return SSH_POOL.get(sc.host, port, sc.user, sc.password, get_ssh_keyfile(sc))
+
+
+def get_run_client(sc: ServerConfig, port: int) -> SSHClient:
+    """Client for commands that only need run(); release it with SSH_POOL.release().
+
+    With ssh_backend="openssh" this is the multiplexed system ssh client, falling
+    back to the pooled Paramiko client if OpenSSH is missing or key auth fails.
+    """
+    if SSH_BACKEND == "openssh" and _openssh_available():
+        cli = OpenSSHClient(sc.host, port, sc.user, sc.password, get_ssh_keyfile(sc))
         try:
-            cli.close()
-        except Exception:
-            pass
+            cli.connect(timeout=5)
+            return cli
+        except Exception as e:
+            log.info("OpenSSH backend unavailable for %s: %s; using Paramiko", sc.host, e)
+    return get_or_connect(sc, port)
+
 
 def _get_ssh_keyfile_quiet(sc: ServerConfig) -> Optional[Path]:
-    # Resolve explicit keyfile without logging
-    if sc.keyfile:
-        p = Path(sc.keyfile)
-        if not p.is_absolute():
-            p = SCRIPT_DIR / p
-        if p.exists():
-            return p
-    # Auto-detect ssh/<alias>_key without logging
-    for a in sc.aliases:
-        p = SCRIPT_DIR / "ssh" / f"{a}_key"
-        if p.exists():
-            return p
-    return None
+    # Same lookup (and per-ServerConfig cache) as get_ssh_keyfile, without logging
+    if LOOKUP_CACHE and sc._keyfile is not _UNSET:
+        return sc._keyfile  # type: ignore[return-value]
+    sc._keyfile = _find_ssh_keyfile(sc)
+    return sc._keyfile  # type: ignore[return-value]
+
+
+@functools.lru_cache(maxsize=1)
+def _posix_shell() -> str:
+    """Interpreter for .sh hooks: bash if installed, else /bin/sh (looked up once)."""
+    return shutil.which("bash") or "/bin/sh"
+
+
+def _spawn(cmd: List[str], env: Optional[Dict[str, str]] = None) -> int:
+    """subprocess.call that stays on CPython's posix_spawn fast path.
+
+    posix_spawn is only used with close_fds=False (and an executable path with a
+    directory, no preexec_fn/cwd); Python's own fds are non-inheritable (PEP 446),
+    so nothing extra leaks to the child. This avoids fork() copying page tables of
+    a process that already has paramiko/cryptography loaded.
+    """
+    return subprocess.call(cmd, env=env, close_fds=False)
 
 
 def _run_local_hook(command_name: str, sc: ServerConfig, alias: str, actual_port: int, extra_args: Optional[List[str]] = None, key_path: Optional[Path] = None) -> Optional[int]:
@@ -905,8 +1857,10 @@ def _run_local_hook(command_name: str, sc: ServerConfig, alias: str, actual_port
         "SOFILAB_PORT": str(actual_port),
         "SOFILAB_USER": sc.user,
         "SOFILAB_PASSWORD": sc.password or "",
-        "SOFILAB_KEYFILE": str((key_path or _get_ssh_keyfile_quiet(sc) or Path()).__str__() if (key_path or _get_ssh_keyfile_quiet(sc)) else ""),
+        "SOFILAB_KEYFILE": str(key_path or _get_ssh_keyfile_quiet(sc) or ""),
         "SOFILAB_ALIAS": alias,
+        # Hooks that run `ssh $SOFILAB_SSH_MUX_OPTS ...` share sofilab's master connection
+        "SOFILAB_SSH_MUX_OPTS": " ".join(_ssh_mux_opts()),
     })
 
     try:
@@ -915,57 +1869,54 @@ def _run_local_hook(command_name: str, sc: ServerConfig, alias: str, actual_port
             hook_path = str(main_py)
             info(f"Using {command_name} hook: {hook_path}")
             cmd = [sys.executable, hook_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            return _spawn(cmd, env)
         # 2) Preferred (Windows/POSIX): main.ps1 / main.sh
         if os.name == 'nt' and main_ps1.exists():
             pwsh = shutil.which("pwsh") or shutil.which("powershell") or "powershell"
             hook_path = str(main_ps1)
             info(f"Using {command_name} hook: {hook_path}")
             cmd = [pwsh, "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", hook_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            return _spawn(cmd, env)
         if os.name != 'nt' and main_sh.exists():
             sh_path = str(main_sh)
             info(f"Using {command_name} hook: {sh_path}")
-            bash = shutil.which("bash")
-            cmd = [bash, sh_path] + (extra_args or []) if bash else ["/bin/sh", sh_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            cmd = [_posix_shell(), sh_path] + (extra_args or [])
+            return _spawn(cmd, env)
         # 3) Fallback new layout: hook.py
         if hook_py_new.exists():
             hook_path = str(hook_py_new)
             info(f"Using {command_name} hook: {hook_path}")
             cmd = [sys.executable, hook_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            return _spawn(cmd, env)
         # 4) Fallback new layout: hook.ps1 / hook.sh
         if os.name == 'nt' and hook_ps1_new.exists():
             pwsh = shutil.which("pwsh") or shutil.which("powershell") or "powershell"
             ps1_path = str(hook_ps1_new)
             info(f"Using {command_name} hook: {ps1_path}")
             cmd = [pwsh, "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", ps1_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            return _spawn(cmd, env)
         if os.name != 'nt' and hook_sh_new.exists():
             sh_path = str(hook_sh_new)
             info(f"Using {command_name} hook: {sh_path}")
-            bash = shutil.which("bash")
-            cmd = [bash, sh_path] + (extra_args or []) if bash else ["/bin/sh", sh_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            cmd = [_posix_shell(), sh_path] + (extra_args or [])
+            return _spawn(cmd, env)
         # 5) Legacy flat layout: scripts/<cmd>.py|ps1|sh
         if hook_py_legacy.exists():
             hook_path = str(hook_py_legacy)
             info(f"Using {command_name} hook: {hook_path}")
             cmd = [sys.executable, hook_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            return _spawn(cmd, env)
         if os.name == 'nt' and hook_ps1_legacy.exists():
             pwsh = shutil.which("pwsh") or shutil.which("powershell") or "powershell"
             ps1_path = str(hook_ps1_legacy)
             info(f"Using {command_name} hook: {ps1_path}")
             cmd = [pwsh, "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", ps1_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            return _spawn(cmd, env)
         if os.name != 'nt' and hook_sh_legacy.exists():
             sh_path = str(hook_sh_legacy)
             info(f"Using {command_name} hook: {sh_path}")
-            bash = shutil.which("bash")
-            cmd = [bash, sh_path] + (extra_args or []) if bash else ["/bin/sh", sh_path] + (extra_args or [])
-            return subprocess.call(cmd, env=env)
+            cmd = [_posix_shell(), sh_path] + (extra_args or [])
+            return _spawn(cmd, env)
     except FileNotFoundError as e:
         warn(f"Hook interpreter not found: {e}")
         return 127
@@ -995,8 +1946,7 @@ def ssh_login(sc: ServerConfig, alias: str) -> int:
 
     info(f"Attempting SSH connection on port {port}...")
     try:
-        cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-        cli.connect(timeout=5)
+        cli = SSH_POOL.get(sc.host, port, sc.user, sc.password, keyfile)
         info("Authentication successful")
         cli.interactive_shell()
         info(f"Disconnected from {sc.host}")
@@ -1006,11 +1956,30 @@ def ssh_login(sc: ServerConfig, alias: str) -> int:
         return 1
     finally:
         try:
-            cli.close()  # type: ignore
+            SSH_POOL.release(cli)  # type: ignore
         except Exception:
             pass
 
 
+def _poll_port(host: str, port: int, want_open: bool, timeout: float) -> bool:
+    """Poll until the port's open state equals want_open; False on timeout.
+
+    Backs off from 250ms to 3s so a state change is seen within a fraction of a
+    second early on without hammering the host over a long wait.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while True:
+        remaining = deadline - time.monotonic()
+        if check_port_open(host, port, timeout=max(0.05, min(1.0, remaining))) == want_open:
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 3.0)
+
+
 def reboot_server(sc: ServerConfig, wait_seconds: Optional[int], alias: str, hook_args: Optional[List[str]] = None) -> int:
     port = determine_ssh_port(sc.port, sc.host)
     if not port:
@@ -1032,8 +2001,7 @@ def reboot_server(sc: ServerConfig, wait_seconds: Optional[int], alias: str, hoo
     cmd = "systemctl reboot || reboot || shutdown -r now"
 
     try:
-        cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-        cli.connect(timeout=5)
+        cli = SSH_POOL.get(sc.host, port, sc.user, sc.password, keyfile)
         # Exec without waiting for long – server will close connection
         code, _out, _err = cli.run(cmd, timeout=5)
         info(f"Reboot command issued; SSH exit code: {code} (disconnect expected)")
@@ -1042,7 +2010,7 @@ def reboot_server(sc: ServerConfig, wait_seconds: Optional[int], alias: str, hoo
         warn(f"SSH error during reboot (likely due to disconnect): {e}")
     finally:
         try:
-            cli.close()  # type: ignore
+            SSH_POOL.discard(cli)  # type: ignore
         except Exception:
             pass
 
@@ -1050,36 +2018,118 @@ def reboot_server(sc: ServerConfig, wait_seconds: Optional[int], alias: str, hoo
         success(f"Reboot initiated on {sc.host}")
         return 0
 
-    # Wait for host to go down then come back
+    # Wait for host to go down then come back; resolve once for the whole poll
+    target = resolve_host_ip(sc.host) or sc.host
     down_timeout = 60
-    waited = 0
     progress(f"Waiting for {sc.host} to go down...")
-    while check_port_open(sc.host, port):
-        time.sleep(2)
-        waited += 2
-        if waited >= down_timeout:
-            warn(f"{sc.host}:{port} still reachable after {down_timeout}s; continuing")
-            break
+    if not _poll_port(target, port, want_open=False, timeout=down_timeout):
+        warn(f"{sc.host}:{port} still reachable after {down_timeout}s; continuing")
 
     progress(f"Waiting for {sc.host} to come back (up to {wait_seconds}s)...")
-    waited = 0
-    while not check_port_open(sc.host, port):
-        time.sleep(3)
-        waited += 3
-        if waited >= wait_seconds:
-            error(f"Timeout waiting for {sc.host}:{port} to come back")
-            return 1
+    if not _poll_port(target, port, want_open=True, timeout=wait_seconds):
+        error(f"Timeout waiting for {sc.host}:{port} to come back")
+        return 1
     success(f"Server is back online: {sc.host}:{port}")
     return 0
 
 
-def upload_script(cli: SSHClient, local_script: Path, remote_rel_dir: str = ".sofilab_scripts") -> str:
+def _sftp_put_pipelined(sftp, local_path: Path, remote_path: str) -> None:
+    """Like sftp.put, but with 1 MiB buffered writes sent as SFTP_WRITE_SIZE
+    pipelined requests (no wait for each write's ACK)."""
+    with local_path.open("rb") as src, sftp.file(remote_path, "wb", bufsize=_SFTP_CHUNK) as dst:
+        dst.set_pipelined(True)
+        dst.MAX_REQUEST_SIZE = SFTP_WRITE_SIZE
+        while True:
+            chunk = src.read(_SFTP_CHUNK)
+            if not chunk:
+                break
+            dst.write(chunk)
+    size = local_path.stat().st_size
+    remote_size = sftp.stat(remote_path).st_size
+    if remote_size != size:
+        raise IOError(f"size mismatch in put! {remote_size} != {size}")
+
+
+def _sha256_file(path: Path) -> str:
+    import hashlib  # only upload verification needs it; keeps it off the startup path
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(functools.partial(f.read, _SFTP_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _verify_upload(cli: SSHClient, local_script: Path, remote_path: str) -> None:
+    """Compare the uploaded file's sha256 (sha256sum, else openssl) with the local one.
+
+    A mismatch removes the remote copy and raises IOError; a server with neither
+    tool only gets a warning.
+    """
+    q = shlex.quote(remote_path)
+    code, out, _ = cli.run(f"cd ~ && {{ sha256sum {q} 2>/dev/null || openssl dgst -sha256 -r {q}; }}", timeout=30)
+    remote_hash = out.split()[0].lower() if code == 0 and out.strip() else ""
+    if not remote_hash:
+        warn(f"Cannot verify upload of {local_script.name}: no sha256sum or openssl on server")
+        return
+    local_hash = _sha256_file(local_script)
+    if remote_hash != local_hash:
+        try:
+            cli.run(f"cd ~ && rm -f {q}", timeout=10)
+        except Exception:
+            pass
+        raise IOError(f"checksum mismatch for {remote_path}: {remote_hash} != {local_hash}")
+    log.debug("Verified upload %s (sha256 %s)", remote_path, local_hash)
+
+
+def _stream_to_channel(chan, f, name: str) -> None:
+    """Send an open binary file down a channel without building bytes objects.
+
+    The file is mapped when possible and paramiko slices the view per SSH
+    packet; otherwise it is read into one reused buffer (the packet keeps its
+    own copy, so the buffer is free again once sendall returns). A remote end
+    that stops reading early only ends the stream; its exit status tells why.
+    """
+    try:
+        size = os.fstat(f.fileno()).st_size
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None  # mmap rejects empty files
+    except (OSError, ValueError):
+        mm = None
+    if mm is not None:
+        with mm, memoryview(mm) as view:
+            try:
+                chan.sendall(view)
+            except OSError as e:
+                # paramiko raises socket.error on a closed channel. Handled inside
+                # the with so no slice of the view outlives the mapping.
+                log.debug("Stream of %s ended early: %s", name, e)
+        return
+    buf = bytearray(_SFTP_CHUNK)
+    view = memoryview(buf)
+    try:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chan.sendall(view[:n])
+    except OSError as e:
+        log.debug("Stream of %s ended early: %s", name, e)
+
+
+def upload_script(cli: SSHClient, local_script: Path, remote_rel_dir: str = ".sofilab_scripts", verify: bool = False) -> str:
     """Upload a local script to the remote host and return its POSIX path.
 
     Primary method: SFTP. Fallback: shell stream via 'cat > file' for servers
     without SFTP (e.g., Dropbear/BusyBox on some routers).
+    With verify, the remote sha256 is checked against the local file.
     Always return a forward-slash (POSIX) path.
     """
+    remote_path = _upload_script(cli, local_script, remote_rel_dir)
+    if verify:
+        _verify_upload(cli, local_script, remote_path)
+    return remote_path
+
+
+def _upload_script(cli: SSHClient, local_script: Path, remote_rel_dir: str) -> str:
     remote_dir = f"{remote_rel_dir}"
     remote_path = f"{remote_dir}/{local_script.name}"
 
@@ -1087,10 +2137,16 @@ def upload_script(cli: SSHClient, local_script: Path, remote_rel_dir: str = ".so
     try:
         sftp = cli.sftp()
         try:
-            sftp.stat(remote_dir)
-        except IOError:
-            sftp.mkdir(remote_dir)
-        sftp.put(str(local_script), remote_path)
+            # One round trip whether or not the dir exists (or a concurrent upload
+            # just made it); if it is really missing, the put below fails and the
+            # shell fallback creates it
+            try:
+                sftp.mkdir(remote_dir)
+            except IOError:
+                pass
+            _sftp_put_pipelined(sftp, local_script, remote_path)
+        finally:
+            sftp.close()
         return remote_path
     except Exception as e:
         warn(f"SFTP unavailable on server, falling back to shell upload: {e}")
@@ -1106,14 +2162,7 @@ def upload_script(cli: SSHClient, local_script: Path, remote_rel_dir: str = ".so
     chan.exec_command(cmd)
     try:
         with local_script.open('rb') as f:
-            while True:
-                chunk = f.read(32768)
-                if not chunk:
-                    break
-                try:
-                    chan.sendall(chunk)
-                except Exception:
-                    break
+            _stream_to_channel(chan, f, str(local_script))
         try:
             chan.shutdown_write()
         except Exception:
@@ -1132,11 +2181,15 @@ def upload_script(cli: SSHClient, local_script: Path, remote_rel_dir: str = ".so
 # File transfer helpers (SFTP)
 # --------------------------
 def _sftp_home(sftp) -> str:
-    """Return remote home directory as POSIX path."""
-    try:
-        return sftp.normalize(".")
-    except Exception:
-        return "/"
+    """Return remote home directory as POSIX path (one round trip per session)."""
+    home = getattr(sftp, "_sofilab_home", None)
+    if home is None:
+        try:
+            home = sftp.normalize(".")
+        except Exception:
+            home = "/"
+        sftp._sofilab_home = home
+    return home
 
 
 def _sftp_abs(sftp, remote_path: str) -> str:
@@ -1145,22 +2198,15 @@ def _sftp_abs(sftp, remote_path: str) -> str:
     - Relative paths are resolved from home
     """
     rp = remote_path or "."
-    home = _sftp_home(sftp)
+    # Absolute paths need no home lookup (saves the normalize round trip)
     if rp.startswith("~"):
-        rp = rp.replace("~", home, 1)
+        rp = _sftp_home(sftp) + rp[1:]
     if not rp.startswith("/"):
-        rp = posixpath.join(home, rp)
-    # Collapse any ../ or ./
-    parts = []
-    for p in rp.split('/'):
-        if not p or p == '.':
-            continue
-        if p == '..':
-            if parts:
-                parts.pop()
-            continue
-        parts.append(p)
-    return "/" + "/".join(parts)
+        rp = posixpath.join(_sftp_home(sftp), rp)
+    # Collapse ./, ../ and repeated slashes; normpath keeps a leading "//"
+    # (POSIX leaves its meaning open), the manual walk this replaces did not
+    rp = posixpath.normpath(rp)
+    return "/" + rp.lstrip("/") if rp.startswith("//") else rp
 
 
 def _is_dir(attrs) -> bool:
@@ -1231,36 +2277,242 @@ def sftp_list_directory(cli: SSHClient, remote_dir: str) -> int:
     return 0
 
 
-def _ensure_remote_dir(sftp, remote_dir: str) -> None:
-    """Recursively create directories on remote if missing."""
-    remote_dir = remote_dir.rstrip('/')
-    if not remote_dir or remote_dir == '/':
+def _ensure_remote_dir(sftp, remote_dir: str, seen: Optional[Set[str]] = None) -> None:
+    """Recursively create directories on remote if missing.
+
+    `seen` collects directories known to exist; share one set across a transfer
+    so a directory already handled costs no round trip and a new one under it
+    costs a single mkdir.
+    """
+    remote_dir = "/" + remote_dir.strip("/")
+    if seen is None:
+        seen = set()
+    if remote_dir == "/" or remote_dir in seen:
         return
-    parts = remote_dir.split('/')
-    path = ''
-    for p in parts:
-        if not p:
-            path = '/'
-            continue
-        path = p if path == '/' else (path + '/' + p) if path else p
+    parent = posixpath.dirname(remote_dir)
+    if parent != "/" and parent not in seen:
+        # Unknown part of the tree, usually an existing destination: look first
         try:
-            sftp.stat('/' + path if not path.startswith('/') else path)
+            if _is_dir(sftp.stat(remote_dir)):
+                seen.add(remote_dir)
+                return
         except IOError:
+            pass
+        _ensure_remote_dir(sftp, parent, seen)
+    try:
+        sftp.mkdir(remote_dir)
+    except Exception:
+        pass
+    seen.add(remote_dir)
+
+
+def _remote_tree(cli: SSHClient, root: str) -> Optional[List[Tuple[str, str]]]:
+    """List everything under root in one exec round trip instead of one SFTP
+    listdir per directory.
+
+    Returns [(kind, relative path)] in pre-order, kind being find's %y letter
+    (d, f, l, ...), or None if find lacks -printf (e.g. BusyBox).
+    """
+    code, out, err = cli.run(f"find {shlex.quote(root)} -mindepth 1 -printf '%y\\t%P\\0'", timeout=60)
+    if not out:
+        return None if code != 0 else []
+    if code != 0:
+        warn(f"Some remote entries could not be listed: {err.strip()}")
+    tree: List[Tuple[str, str]] = []
+    for rec in out.split("\0"):
+        kind, sep, rel = rec.partition("\t")
+        if sep and rel:
+            tree.append((kind, rel))
+    return tree
+
+
+def _remote_kinds(cli: SSHClient, paths: List[str]) -> Optional[str]:
+    """Classify several absolute remote paths in one exec round trip instead of
+    one SFTP stat each.
+
+    Returns one letter per path, "d" (directory), "f" (anything else that
+    exists) or "-" (missing/unreadable), following symlinks like stat; None if
+    the command did not run.
+    """
+    script = (
+        "for p in " + " ".join(shlex.quote(p) for p in paths) + "; do "
+        'if [ -d "$p" ]; then printf d; elif [ -e "$p" ]; then printf f; else printf -; fi; done'
+    )
+    try:
+        code, out, _ = cli.run(script, timeout=30)
+    except Exception:
+        return None
+    if code != 0 or len(out) != len(paths):
+        return None
+    return out
+
+
+# --------------------------
+# Directory transfer via tar streams
+# --------------------------
+# tarfile is imported inside the helpers below: only recursive transfers use it,
+# so other commands do not pay for its import at startup
+@functools.lru_cache(maxsize=1)
+def _tar_extract_kw() -> Dict[str, str]:
+    """Extraction filter for Pythons that have one (3.12+ and security backports)."""
+    import tarfile
+    return {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+
+def _remote_has_tar(cli: SSHClient) -> bool:
+    try:
+        rc, _, _ = cli.run("command -v tar >/dev/null 2>&1", timeout=10)
+    except Exception:
+        return False
+    return rc == 0
+
+
+def _tar_plain(ti: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+    """Keep regular files and directories only, like the per-file SFTP walk."""
+    if not (ti.isreg() or ti.isdir()):
+        return None
+    if ti.name.startswith("/") or ".." in ti.name.split("/"):
+        return None
+    return ti
+
+
+def _finish_tar_channel(chan) -> Tuple[int, str]:
+    """Wait for the remote tar to exit; return (exit code, stderr text)."""
+    rc = chan.recv_exit_status()
+    err: List[bytes] = []
+    while chan.recv_stderr_ready():
+        err.append(chan.recv_stderr(RECV_CHUNK))
+    return rc, b"".join(err).decode(errors="ignore").strip()
+
+
+def _tar_upload_dir(cli: SSHClient, local_dir: Path, dest_dir_abs: str) -> Tuple[int, str]:
+    """Copy a local tree into dest_dir_abs as one tar stream over an exec channel.
+
+    One continuous stream instead of an SFTP open/write/close (plus stat/mkdir)
+    round trip per file. Returns the remote tar's (exit code, stderr).
+    """
+    import tarfile
+    assert cli.client is not None, "SSH not connected"
+    q = shlex.quote(dest_dir_abs)
+    chan = cli.client.get_transport().open_session()
+    try:
+        chan.exec_command(f"mkdir -p {q} && cd {q} && tar -x -o -f -")
+        try:
+            with chan.makefile("wb", _SFTP_CHUNK) as out, \
+                    tarfile.open(fileobj=out, mode="w|", bufsize=_SFTP_CHUNK, dereference=True) as tf:
+                tf.add(str(local_dir), arcname=".", filter=_tar_plain)
+        except OSError as e:
+            # The remote side went away early; its stderr below says why
+            log.debug("tar upload stream to %s ended early: %s", dest_dir_abs, e)
+        chan.shutdown_write()
+        return _finish_tar_channel(chan)
+    finally:
+        chan.close()
+
+
+def _tar_download_dir(cli: SSHClient, remote_dir_abs: str, local_dir: Path) -> Tuple[int, str]:
+    """Copy a remote tree into local_dir as one tar stream over an exec channel.
+
+    Returns the remote tar's (exit code, stderr).
+    """
+    import tarfile
+    assert cli.client is not None, "SSH not connected"
+    chan = cli.client.get_transport().open_session()
+    try:
+        chan.exec_command(f"tar -c -h -f - -C {shlex.quote(remote_dir_abs)} .")
+        try:
+            with chan.makefile("rb", _SFTP_CHUNK) as src, \
+                    tarfile.open(fileobj=src, mode="r|", bufsize=_SFTP_CHUNK) as tf:
+                for ti in tf:
+                    if _tar_plain(ti) is not None:
+                        tf.extract(ti, str(local_dir), **_tar_extract_kw())
+        except tarfile.TarError as e:
+            # Empty or cut-short stream; the remote stderr says why
+            log.debug("tar download stream from %s ended early: %s", remote_dir_abs, e)
+        return _finish_tar_channel(chan)
+    finally:
+        chan.close()
+
+
+def _sftp_fan_out(cli: SSHClient, sftp, jobs: List[Tuple[object, object]], transfer) -> int:
+    """Run transfer(sftp, src, dst) for each (src, dst) job; returns 1 if any failed.
+
+    Files are spread over up to SFTP_PARALLEL SFTP channels (one per worker
+    thread, all on the one transport) so per-file open/close/stat round trips
+    and paramiko's per-file work overlap. A single job, or SFTP_PARALLEL=1,
+    stays on the caller's channel.
+    """
+    def _one(chan_sftp, src, dst) -> int:
+        try:
+            transfer(chan_sftp, src, dst)
+            return 0
+        except Exception as e:
+            error(f"Transfer failed: {src} ({e})")
+            return 1
+
+    workers = min(SFTP_PARALLEL, len(jobs))
+    if workers <= 1:
+        return max((_one(sftp, src, dst) for src, dst in jobs), default=0)
+
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+
+    def _worker(job) -> int:
+        chan_sftp = getattr(local, "sftp", None)
+        if chan_sftp is None:
+            try:
+                chan_sftp = cli.sftp()
+            except Exception:
+                chan_sftp = sftp  # server limits sessions: share the caller's channel
+            else:
+                with lock:
+                    opened.append(chan_sftp)
+            local.sftp = chan_sftp
+        return _one(chan_sftp, *job)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            return max(ex.map(_worker, jobs))
+    finally:
+        for chan_sftp in opened:
             try:
-                sftp.mkdir('/' + path if not path.startswith('/') else path)
+                chan_sftp.close()
             except Exception:
                 pass
 
 
+def _get_file(sftp, remote_file_abs: str, local_dir: Path, size: Optional[int] = None) -> None:
+    """Download one file with prefetched reads; a size already known from a
+    stat/listing skips the extra stat round trip sftp.get() would make."""
+    local_path = local_dir / posixpath.basename(remote_file_abs)
+    if size is None:
+        sftp.get(remote_file_abs, str(local_path), max_concurrent_prefetch_requests=SFTP_MAX_REQUESTS)
+    else:
+        with sftp.open(remote_file_abs, "rb") as fr, open(local_path, "wb") as fl:
+            fr.prefetch(size, SFTP_MAX_REQUESTS)
+            shutil.copyfileobj(fr, fl, _SFTP_CHUNK)
+    info(f"Downloaded: {remote_file_abs} -> {local_path}")
+
+
+def _put_file(sftp, local_file: Path, dest_dir_abs: str) -> None:
+    remote_path = posixpath.join(dest_dir_abs, local_file.name)
+    _sftp_put_pipelined(sftp, local_file, remote_path)
+    info(f"Uploaded: {local_file} -> {remote_path}")
+
+
 def download_items(cli: SSHClient, remote_paths: List[str], local_dest: Path, recursive: bool) -> int:
     sftp = cli.sftp()
-    home = _sftp_home(sftp)
     local_dest.mkdir(parents=True, exist_ok=True)
+    # Walk first (local dirs created as we go), then fetch the files in parallel
+    jobs: List[Tuple[object, object]] = []
+    sizes: Dict[str, int] = {}  # remote path -> size, where a stat/listing already told us
 
-    def _download_file(remote_file_abs: str, local_dir: Path) -> None:
-        local_path = local_dir / posixpath.basename(remote_file_abs)
-        sftp.get(remote_file_abs, str(local_path))
-        info(f"Downloaded: {remote_file_abs} -> {local_path}")
+    def _download_file(remote_file_abs: str, local_dir: Path, attrs=None) -> None:
+        jobs.append((remote_file_abs, local_dir))
+        size = getattr(attrs, "st_size", None)
+        if size is not None:
+            sizes[remote_file_abs] = size
 
     def _walk_dir(remote_dir_abs: str, local_dir: Path):
         try:
@@ -1277,38 +2529,67 @@ def download_items(cli: SSHClient, remote_paths: List[str], local_dest: Path, re
                 else:
                     info(f"Skip directory (use -r to recurse): {r_path}")
             else:
-                _download_file(r_path, local_dir)
+                _download_file(r_path, local_dir, ent)
 
     any_error = 0
-    for rp in remote_paths:
-        rp_abs = _sftp_abs(sftp, rp)
-        try:
-            attrs = sftp.stat(rp_abs)
-        except IOError as e:
-            error(f"Remote path not found: {rp} ({e})")
-            any_error = 1
-            continue
-        if _is_dir(attrs):
-            _walk_dir(rp_abs, local_dest / posixpath.basename(rp_abs.rstrip('/')))
+    use_tar: Optional[bool] = None
+    abs_paths = [_sftp_abs(sftp, rp) for rp in remote_paths]
+    # Several sources: classify them together rather than one stat RTT each
+    kinds = _remote_kinds(cli, abs_paths) if len(abs_paths) > 1 else None
+    for i, (rp, rp_abs) in enumerate(zip(remote_paths, abs_paths)):
+        kind = kinds[i] if kinds else "-"
+        attrs = None
+        if kind == "-":
+            # Unknown or missing: stat for the authoritative answer and error text
+            try:
+                attrs = sftp.stat(rp_abs)
+                kind = "d" if _is_dir(attrs) else "f"
+            except IOError as e:
+                error(f"Remote path not found: {rp} ({e})")
+                any_error = 1
+                continue
+        if kind == "d":
+            local_dir = local_dest / posixpath.basename(rp_abs.rstrip('/'))
+            if recursive and use_tar is None:
+                use_tar = _remote_has_tar(cli)
+            if recursive and use_tar:
+                rc, err = _tar_download_dir(cli, rp_abs, local_dir)
+                if rc != 0:
+                    error(f"tar download failed: {rp_abs} ({err or f'exit {rc}'})")
+                    any_error = 1
+                else:
+                    info(f"Downloaded: {rp_abs} -> {local_dir}")
+                continue
+            tree = _remote_tree(cli, rp_abs) if recursive else None
+            if tree is None:
+                _walk_dir(rp_abs, local_dir)
+                continue
+            local_dir.mkdir(parents=True, exist_ok=True)
+            for kind, rel in tree:
+                if kind == "d":
+                    (local_dir / rel).mkdir(parents=True, exist_ok=True)
+                elif kind in ("f", "l"):
+                    _download_file(posixpath.join(rp_abs, rel), (local_dir / rel).parent)
         else:
-            _download_file(rp_abs, local_dest)
+            _download_file(rp_abs, local_dest, attrs)
 
-    return any_error
+    return _sftp_fan_out(cli, sftp, jobs, lambda s, r, d: _get_file(s, r, d, sizes.get(r))) or any_error
 
 
 def upload_items(cli: SSHClient, local_paths: List[Path], remote_dest: str, recursive: bool) -> int:
     sftp = cli.sftp()
     dest_abs = _sftp_abs(sftp, remote_dest or ".")
-    _ensure_remote_dir(sftp, dest_abs)
+    seen_dirs: Set[str] = set()
+    _ensure_remote_dir(sftp, dest_abs, seen_dirs)
+    # Walk first (remote dirs created as we go), then send the files in parallel
+    jobs: List[Tuple[object, object]] = []
 
     def _upload_file(local_file: Path, dest_dir_abs: str) -> None:
-        remote_path = posixpath.join(dest_dir_abs, local_file.name)
-        sftp.put(str(local_file), remote_path)
-        info(f"Uploaded: {local_file} -> {remote_path}")
+        jobs.append((local_file, dest_dir_abs))
 
     def _walk_local_dir(local_dir: Path, dest_dir_abs: str):
         # Ensure remote dir exists
-        _ensure_remote_dir(sftp, dest_dir_abs)
+        _ensure_remote_dir(sftp, dest_dir_abs, seen_dirs)
         for entry in local_dir.iterdir():
             if entry.is_dir():
                 if recursive:
@@ -1319,17 +2600,29 @@ def upload_items(cli: SSHClient, local_paths: List[Path], remote_dest: str, recu
                 _upload_file(entry, dest_dir_abs)
 
     any_error = 0
+    use_tar: Optional[bool] = None
     for lp in local_paths:
         if not lp.exists():
             error(f"Local path not found: {lp}")
             any_error = 1
             continue
         if lp.is_dir():
-            _walk_local_dir(lp, posixpath.join(dest_abs, lp.name))
+            dest_dir_abs = posixpath.join(dest_abs, lp.name)
+            if recursive and use_tar is None:
+                use_tar = _remote_has_tar(cli)
+            if recursive and use_tar:
+                rc, err = _tar_upload_dir(cli, lp, dest_dir_abs)
+                if rc != 0:
+                    error(f"tar upload failed: {lp} ({err or f'exit {rc}'})")
+                    any_error = 1
+                else:
+                    info(f"Uploaded: {lp} -> {dest_dir_abs}")
+                continue
+            _walk_local_dir(lp, dest_dir_abs)
         else:
             _upload_file(lp, dest_abs)
 
-    return any_error
+    return _sftp_fan_out(cli, sftp, jobs, _put_file) or any_error
 
 
 def execute_remote_command(sc: ServerConfig, alias: str, cmd_argv: List[str], force_tty: bool, env_kv: Optional[List[str]] = None, workdir: Optional[str] = None) -> int:
@@ -1376,8 +2669,7 @@ def execute_remote_command(sc: ServerConfig, alias: str, cmd_argv: List[str], fo
     # We'll detect the remote shell after connecting and build the final exec string then
 
     try:
-        cli = SSHClient(sc.host, port, sc.user, sc.password, get_ssh_keyfile(sc))
-        cli.connect(timeout=5)
+        cli = get_or_connect(sc, port)
     except Exception as e:
         error(f"SSH connection failed: {e}")
         return 1
@@ -1422,7 +2714,7 @@ def execute_remote_command(sc: ServerConfig, alias: str, cmd_argv: List[str], fo
         if force_tty:
             # Interactive bridging similar to script execution
             if os.name == 'nt':
-                import threading, msvcrt
+                import threading
                 stop = False
                 def reader():
                     while not stop:
@@ -1435,15 +2727,11 @@ def execute_remote_command(sc: ServerConfig, alias: str, cmd_argv: List[str], fo
                 t.start()
                 try:
                     while True:
-                        if msvcrt.kbhit():
-                            ch = msvcrt.getwch()
-                            if ch == '\r':
-                                chan.send("\r")
-                            else:
-                                chan.send(ch.encode('utf-8'))
-                        if chan.exit_status_ready():
+                        data = _win_console_input()
+                        if data:
+                            chan.sendall(data)
+                        if chan.status_event.wait(0.01) or chan.exit_status_ready():
                             break
-                        time.sleep(0.01)
                 except KeyboardInterrupt:
                     pass
                 finally:
@@ -1530,45 +2818,53 @@ def execute_remote_command(sc: ServerConfig, alias: str, cmd_argv: List[str], fo
                         pass
                 return chan.recv_exit_status()
 
-        # Non-PTY mode: stream stdout/stderr
-        stdout = io.BytesIO()
-        stderr = io.BytesIO()
+        # Non-PTY mode: collect stdout/stderr chunks as-is and join once at the end
+        stdout: List[bytes] = []
+        stderr: List[bytes] = []
         while True:
-            if chan.recv_ready():
-                stdout.write(chan.recv(32768))
-            if chan.recv_stderr_ready():
-                stderr.write(chan.recv_stderr(32768))
+            while chan.recv_ready():
+                stdout.append(chan.recv(RECV_CHUNK))
+            while chan.recv_stderr_ready():
+                stderr.append(chan.recv_stderr(RECV_CHUNK))
             if chan.exit_status_ready():
                 while chan.recv_ready():
-                    stdout.write(chan.recv(32768))
+                    stdout.append(chan.recv(RECV_CHUNK))
                 while chan.recv_stderr_ready():
-                    stderr.write(chan.recv_stderr(32768))
+                    stderr.append(chan.recv_stderr(RECV_CHUNK))
                 break
-            time.sleep(0.01)
-        out = stdout.getvalue().decode(errors="ignore")
-        err = stderr.getvalue().decode(errors="ignore")
+            select.select([chan], [], [], 1.0)
+        out = b"".join(stdout).decode(errors="ignore")
+        err = b"".join(stderr).decode(errors="ignore")
         if out:
             sys.stdout.write(out)
         if err:
             sys.stderr.write(err)
         return chan.recv_exit_status()
     finally:
-        try:
-            cli.close()
-        except Exception:
-            pass
+        SSH_POOL.release(cli)
+
+
+_SHELL_DETECT_CMD = "command -v bash >/dev/null 2>&1 && echo bash || echo sh"
 
 
 def detect_remote_shell(cli: SSHClient) -> str:
+    if cli.remote_shell:
+        return cli.remote_shell
     try:
-        code, out, _ = cli.run("command -v bash >/dev/null 2>&1 && echo bash || echo sh", timeout=5)
+        code, out, _ = cli.run(_SHELL_DETECT_CMD, timeout=5)
         if code == 0 and out.strip() == "sh":
-            return "sh"
-        return "bash"
+            cli.remote_shell = "sh"
+        else:
+            cli.remote_shell = "bash"
+        return cli.remote_shell
     except Exception:
         return "bash"
 
 
+# Names `env NAME=value` accepts; anything else would break or inject into the command line
+_ENV_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
 def execute_remote_script(cli: SSHClient, sc: ServerConfig, remote_path: str, configured_port: int, actual_port: int, force_tty: bool, script_exit_on_error: bool, alias: str, script_args: Optional[List[str]] = None, additional_env: Optional[Dict[str, str]] = None) -> int:
     # Prepare env
     env: Dict[str, str] = {
@@ -1600,7 +2896,11 @@ def execute_remote_script(cli: SSHClient, sc: ServerConfig, remote_path: str, co
         "SOFILAB_PASSWORD": sc.password or "",
     })
     if additional_env:
-        env.update({k: str(v) for k, v in additional_env.items()})
+        for k, v in additional_env.items():
+            if _ENV_NAME.fullmatch(k):
+                env[k] = str(v)
+            else:
+                warn(f"Skipping invalid environment variable name: {k!r}")
 
     shell = detect_remote_shell(cli)
     shell_opts = " -e" if script_exit_on_error else ""
@@ -1609,9 +2909,14 @@ def execute_remote_script(cli: SSHClient, sc: ServerConfig, remote_path: str, co
     if script_args:
         # Safely quote each argument for remote shell
         args_part = " " + " ".join(shlex.quote(x) for x in script_args)
+    # Pass env inline: most sshd configs only AcceptEnv LANG/LC_*, silently dropping
+    # per-variable env requests (each of which is also a round trip). The password is
+    # kept off the remote command line (visible in ps) and still sent as an env request.
+    secret_env = {k: v for k, v in env.items() if k == "SOFILAB_PASSWORD" and v}
+    env_prefix = " ".join(f"{k}={shlex.quote(v)}" for k, v in env.items() if k not in secret_env)
     cmd = (
         f"cd ~ && chmod +x {shlex.quote(remote_path)} && "
-        f"{shell}{shell_opts} {shlex.quote(remote_path)}{args_part} ; "
+        f"env {env_prefix} {shell}{shell_opts} {shlex.quote(remote_path)}{args_part} ; "
         f"rc=$?; rm -f {shlex.quote(remote_path)}; exit $rc"
     )
 
@@ -1620,65 +2925,93 @@ def execute_remote_script(cli: SSHClient, sc: ServerConfig, remote_path: str, co
     chan = cli.client.get_transport().open_session()
     if force_tty:
         chan.get_pty()
-    for k, v in env.items():
+    if secret_env:
         try:
-            chan.update_environment({k: v})
+            chan.update_environment(secret_env)
         except Exception:
             pass
     chan.exec_command(cmd)
 
+    # Stream raw chunks straight to stdout; only the remote log needs line framing,
+    # so keep a pending partial line per stream between chunks
+    script_name = posixpath.basename(remote_path)
+    tails = {"out": bytearray(), "err": bytearray()}
+
+    def _emit(data: bytes, stream: str) -> None:
+        _write_raw(data, flush=IS_TTY or force_tty)
+        tail = tails[stream]
+        tail += data
+        # Only complete lines are logged; an unterminated remainder waits for the
+        # next chunk so a line split across reads is logged once, whole
+        done, sep, rest = tail.rpartition(b"\n")
+        if not sep:
+            return
+        tails[stream] = bytearray(rest)
+        # One decode per chunk (a newline never falls inside a UTF-8 sequence);
+        # only PTY output (CRLF) needs the per-line strip
+        text = done.decode("utf-8", "ignore")
+        lines = text.split("\n")
+        if "\r" in text:
+            lines = [ln.rstrip("\r") for ln in lines]
+        log_remote_batch(alias, script_name, lines)
+
+    def _flush_tails() -> None:
+        sys.stdout.flush()
+        for stream, tail in tails.items():
+            if tail:
+                log_remote(alias, script_name, tail.rstrip(b"\r").decode("utf-8", "ignore"))
+                tails[stream] = bytearray()
+        # One write per finished script, so its output is on disk before the next
+        # step starts rather than at the next periodic flush
+        _REMOTE_WRITER.flush()
+
+    def _pump() -> None:
+        # Drain everything buffered on each stream, then emit it as one write.
+        # chan.makefile() readers are not used here: paramiko's BufferedFile is pure
+        # Python and line iteration would add per-line work this chunk pump avoids.
+        for ready, recv, stream in ((chan.recv_ready, chan.recv, "out"),
+                                    (chan.recv_stderr_ready, chan.recv_stderr, "err")):
+            chunks = []
+            while ready():
+                chunks.append(recv(RECV_CHUNK))
+            if chunks:
+                _emit(b"".join(chunks), stream)
+
+    def _finished() -> bool:
+        # Exit status (or a closed channel) with nothing left buffered
+        return (chan.exit_status_ready() or chan.closed) and not chan.recv_ready() and not chan.recv_stderr_ready()
+
+    sys.stdout.flush()
+
     # If TTY is requested, allow interactive stdin bridging
     if force_tty:
         if os.name == 'nt':
-            import threading, msvcrt
+            import threading
 
             stop = False
 
             def reader():
                 while not stop:
-                    if chan.recv_ready():
-                        data = chan.recv(32768)
-                        if not data:
-                            break
-                        text = data.decode(errors="ignore")
-                        for line in text.splitlines():
-                            print(line)
-                            import posixpath as _pp
-                            log_remote(alias, _pp.basename(remote_path), line)
-                    if chan.recv_stderr_ready():
-                        data = chan.recv_stderr(32768)
-                        if not data:
-                            break
-                        text = data.decode(errors="ignore")
-                        for line in text.splitlines():
-                            print(line)
-                            import posixpath as _pp
-                            log_remote(alias, _pp.basename(remote_path), line)
-                    if chan.exit_status_ready():
+                    _pump()
+                    if _finished():
                         break
-                    time.sleep(0.01)
+                    select.select([chan], [], [], 1.0)
 
             t = threading.Thread(target=reader, daemon=True)
             t.start()
             try:
                 while True:
-                    if msvcrt.kbhit():
-                        ch = msvcrt.getwch()
-                        if ch == '\r':
-                            chan.send("\r")
-                        else:
-                            try:
-                                chan.send(ch.encode('utf-8'))
-                            except Exception:
-                                chan.send(ch)
-                    if chan.exit_status_ready():
+                    data = _win_console_input()
+                    if data:
+                        chan.sendall(data)
+                    if chan.status_event.wait(0.01) or chan.exit_status_ready():
                         break
-                    time.sleep(0.01)
             except KeyboardInterrupt:
                 pass
             finally:
                 stop = True
                 rc = chan.recv_exit_status()
+                _flush_tails()
                 try:
                     chan.close()
                 except Exception:
@@ -1691,24 +3024,7 @@ def execute_remote_script(cli: SSHClient, sc: ServerConfig, remote_path: str, co
                 while True:
                     rlist, _, _ = _select.select([chan, sys.stdin], [], [])
                     if chan in rlist:
-                        if chan.recv_ready():
-                            data = chan.recv(32768)
-                            if not data:
-                                break
-                            text = data.decode(errors="ignore")
-                            for line in text.splitlines():
-                                print(line)
-                            import posixpath as _pp
-                            log_remote(alias, _pp.basename(remote_path), line)
-                        if chan.recv_stderr_ready():
-                            data = chan.recv_stderr(32768)
-                            if not data:
-                                break
-                            text = data.decode(errors="ignore")
-                            for line in text.splitlines():
-                                print(line)
-                            import posixpath as _pp
-                            log_remote(alias, _pp.basename(remote_path), line)
+                        _pump()
                     if sys.stdin in rlist:
                         try:
                             data = os.read(sys.stdin.fileno(), 1024)
@@ -1720,53 +3036,30 @@ def execute_remote_script(cli: SSHClient, sc: ServerConfig, remote_path: str, co
                             except Exception:
                                 # If channel closed while sending, exit loop
                                 break
-                    if chan.exit_status_ready():
+                    if chan.exit_status_ready() or chan.closed:
                         # Drain remaining
-                        while chan.recv_ready():
-                            text = chan.recv(32768).decode(errors="ignore")
-                            for line in text.splitlines():
-                                print(line)
-                                import posixpath as _pp
-                                log_remote(alias, _pp.basename(remote_path), line)
-                        while chan.recv_stderr_ready():
-                            text = chan.recv_stderr(32768).decode(errors="ignore")
-                            for line in text.splitlines():
-                                print(line)
-                                import posixpath as _pp
-                                log_remote(alias, _pp.basename(remote_path), line)
+                        _pump()
                         break
             finally:
                 rc = chan.recv_exit_status()
+                _flush_tails()
                 try:
                     chan.close()
                 except Exception:
                     pass
                 return rc
 
-    # Non-interactive mode: only read outputs
+    # Non-interactive mode: only read outputs, sleeping in select until the channel
+    # has data (its fileno() signals both stdout and stderr)
     try:
         while True:
-            if chan.recv_ready():
-                data = chan.recv(32768)
-                if not data:
-                    break
-                text = data.decode(errors="ignore")
-                for line in text.splitlines():
-                    print(line)
-                    log_remote(alias, remote_path.name, line)
-            if chan.recv_stderr_ready():
-                data = chan.recv_stderr(32768)
-                if not data:
-                    break
-                text = data.decode(errors="ignore")
-                for line in text.splitlines():
-                    print(line)
-                    log_remote(alias, remote_path.name, line)
-            if chan.exit_status_ready():
+            select.select([chan], [], [], 1.0)
+            _pump()
+            if _finished():
                 break
-            time.sleep(0.01)
     finally:
         rc = chan.recv_exit_status()
+        _flush_tails()
         try:
             chan.close()
         except Exception:
@@ -1782,11 +3075,35 @@ def _resolve_script_set_dir(set_name: str) -> Optional[Path]:
     return None
 
 
+def list_sh(root: Path, recursive: bool = False) -> List[str]:
+    """Sorted relative paths of *.sh files under root, from os.scandir dirents.
+
+    Recursion does not follow directory symlinks (same as Path.rglob).
+    """
+    found: List[str] = []
+    stack = [("", str(root))]
+    while stack:
+        prefix, d = stack.pop()
+        with os.scandir(d) as it:
+            for e in it:
+                if e.name.endswith(".sh") and e.is_file():
+                    found.append(prefix + e.name)
+                elif recursive and e.is_dir(follow_symlinks=False):
+                    stack.append((prefix + e.name + "/", e.path))
+    found.sort()
+    return found
+
+
+def list_subdirs(root: Path) -> List[str]:
+    with os.scandir(root) as it:
+        return sorted(e.name for e in it if e.is_dir())
+
+
 def _discover_priority_scripts(root: Path) -> List[Path]:
     numbered: List[Tuple[int, Path]] = []
     unnumbered: List[Path] = []
-    for p in sorted(root.glob("*.sh")):
-        name = p.name
+    for name in list_sh(root):
+        p = root / name
         m = re.match(r"^(\d+)_.*\.sh$", name)
         if m:
             try:
@@ -1833,6 +3150,11 @@ def _read_args_file(root: Path, script_path: Path) -> List[str]:
         return [x for x in af.read_text(encoding="utf-8", errors="ignore").split() if x]
 
 
+# Concurrent SFTP channels used to upload a script set; kept low to stay well
+# under sshd's MaxSessions (default 10) on the shared connection
+_UPLOAD_WORKERS = 4
+
+
 def run_scripts(sc: ServerConfig, gcfg: GlobalConfig, alias: str, set_name: str, common_args: Optional[List[str]] = None, dry_run: bool = False) -> int:
     set_dir = _resolve_script_set_dir(set_name)
     if not set_dir:
@@ -1874,26 +3196,48 @@ def run_scripts(sc: ServerConfig, gcfg: GlobalConfig, alias: str, set_name: str,
         return 1
 
     try:
-        cli = SSHClient(sc.host, use_port, sc.user, sc.password, get_ssh_keyfile(sc))
-        cli.connect(timeout=5)
+        cli = get_or_connect(sc, use_port)
     except Exception as e:
         error(f"SSH connection failed: {e}")
         return 1
 
+    pending: List[str] = []
     try:
         set_env = _read_env_file(set_dir)
         total = len(scripts)
+
+        # Upload the whole set up front over parallel SFTP channels on the one
+        # transport; execution below stays strictly in order
+        progress(f"Uploading {total} script(s) to server...")
+        with ThreadPoolExecutor(max_workers=min(_UPLOAD_WORKERS, total)) as ex:
+            try:
+                pending = list(ex.map(lambda p: upload_script(cli, p, verify=sc.verify_uploads), scripts))
+            except IOError as e:
+                error(f"Script upload failed: {e}")
+                return 1
+        success("Scripts uploaded successfully")
+
         for idx, sp in enumerate(scripts, start=1):
             print("")
             print(f"📋 [{idx}/{total}] Processing: {sp.name}")
             print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
 
+            t = cli.transport
+            if t is None or not t.is_active():
+                # A previous step (e.g. an sshd restart) dropped the session; the
+                # uploaded scripts are still on disk, so reconnect once and go on
+                SSH_POOL.discard(cli)
+                try:
+                    cli = get_or_connect(sc, use_port)
+                except Exception as e:
+                    error(f"SSH reconnection failed: {e}")
+                    return 1
+                info("Reconnected to server")
+
             per_args = _read_args_file(set_dir, sp)
             eff_args = (common or []) + per_args
-
-            progress(f"Uploading {sp.name} to server...")
-            remote_path = upload_script(cli, sp)
-            success("Script uploaded successfully")
+            # execute_remote_script removes the file once it has run
+            remote_path = pending.pop(0)
 
             print("")
             progress(f"Executing {sp.name} on {sc.host}...")
@@ -1925,12 +3269,20 @@ def run_scripts(sc: ServerConfig, gcfg: GlobalConfig, alias: str, set_name: str,
                 error(f"Script execution failed: {sp.name}")
                 return rc
             success(f"Script executed successfully: {sp.name}")
-            if idx < total:
-                info("Waiting 3 seconds before next script to avoid rate limiting...")
-                time.sleep(3)
+            # All scripts share one connection, so there is no handshake rate to
+            # protect; pause only if the user asked for it
+            if idx < total and gcfg.script_delay > 0:
+                info(f"Waiting {gcfg.script_delay:g} seconds before next script...")
+                time.sleep(gcfg.script_delay)
     finally:
+        if pending:
+            # Stopped early: drop uploaded scripts that never ran
+            try:
+                cli.run("cd ~ && rm -f " + " ".join(shlex.quote(p) for p in pending), timeout=10)
+            except Exception:
+                pass
         try:
-            cli.close()
+            SSH_POOL.release(cli)
         except Exception:
             pass
 
@@ -1941,6 +3293,108 @@ def run_scripts(sc: ServerConfig, gcfg: GlobalConfig, alias: str, set_name: str,
     return 0
 
 
+class _HostPrefixedStream:
+    """Stand-in for sys.stdout/sys.stderr while run_scripts_many runs hosts in threads.
+
+    A worker's writes (text from print/info, raw bytes from _write_raw via .buffer)
+    are held until a newline and then written as whole lines prefixed "[alias] ",
+    so hosts never mix mid-line. Writes from threads with no alias pass through.
+    """
+
+    def __init__(self, target, host: threading.local, lock: threading.Lock):
+        self._target = target
+        self._raw = getattr(target, "buffer", None)
+        self._host = host
+        self._lock = lock
+        self._pending: Dict[int, bytearray] = {}
+        self.buffer = self
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _put(self, data: bytes) -> None:
+        with self._lock:
+            if self._raw is None:
+                self._target.write(data.decode("utf-8", "ignore"))
+            else:
+                self._target.flush()
+                self._raw.write(data)
+            self._target.flush()
+
+    def write(self, data):
+        alias = getattr(self._host, "alias", None)
+        b = data.encode("utf-8", "replace") if isinstance(data, str) else bytes(data)
+        if alias is None:
+            self._put(b)
+            return len(data)
+        tail = self._pending.setdefault(threading.get_ident(), bytearray())
+        tail += b
+        done, sep, rest = tail.rpartition(b"\n")
+        if sep:
+            self._pending[threading.get_ident()] = bytearray(rest)
+            prefix = f"[{alias}] ".encode("utf-8")
+            self._put(b"".join(prefix + ln + b"\n" for ln in done.split(b"\n")))
+        return len(data)
+
+    def flush(self) -> None:
+        # Held partial lines wait for their newline (or end_host)
+        if getattr(self._host, "alias", None) is None:
+            with self._lock:
+                self._target.flush()
+
+    def end_host(self) -> None:
+        """Write out the calling worker's unterminated last line, if any."""
+        tail = self._pending.pop(threading.get_ident(), None)
+        if tail:
+            self._put(f"[{self._host.alias}] ".encode("utf-8") + bytes(tail) + b"\n")
+
+
+def run_scripts_many(servers: Dict[str, ServerConfig], gcfg: GlobalConfig, aliases: List[str], set_name: str, common_args: Optional[List[str]] = None, dry_run: bool = False, parallel: int = 0) -> int:
+    """Run a script set on several hosts concurrently; returns the first non-zero exit code.
+
+    Concurrency is bounded (default min(16, hosts)) so a large host list does not
+    open a burst of simultaneous SSH handshakes; wall time is then roughly that of
+    the slowest host rather than the sum. Each output line is prefixed with
+    its host's alias; lines from different hosts interleave, but never mix.
+    """
+    workers = max(1, parallel or min(16, len(aliases)))
+    results: Dict[str, int] = {}
+    host = threading.local()
+    lock = threading.Lock()
+    streams = (_HostPrefixedStream(sys.stdout, host, lock), _HostPrefixedStream(sys.stderr, host, lock))
+
+    def _run(a: str) -> int:
+        host.alias = a
+        try:
+            return run_scripts(servers[a], gcfg, a, set_name, common_args, dry_run)
+        finally:
+            for st in streams:
+                st.end_host()
+            host.alias = None
+
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = streams
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futures = {a: ex.submit(_run, a) for a in aliases}
+            for a, fut in futures.items():
+                try:
+                    results[a] = fut.result()
+                except Exception as e:
+                    error(f"[{a}] run-scripts failed: {e}")
+                    results[a] = 1
+    finally:
+        sys.stdout, sys.stderr = saved
+
+    print("")
+    print("📊 Multi-host summary")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    for a in aliases:
+        rc = results[a]
+        print(f"  {'✅' if rc == 0 else '❌'} {a}" + ("" if rc == 0 else f" (exit {rc})"))
+    return next((rc for rc in (results[a] for a in aliases) if rc != 0), 0)
+
+
 def run_single_script(sc: ServerConfig, gcfg: GlobalConfig, alias: str, script_name: str, script_args: Optional[List[str]] = None) -> int:
     use_port = determine_ssh_port(sc.port, sc.host)
     if not use_port:
@@ -1967,14 +3421,10 @@ def run_single_script(sc: ServerConfig, gcfg: GlobalConfig, alias: str, script_n
         print(f"Available scripts (recursive) under {base}:")
         try:
             if base.exists():
-                any_found = False
-                for p in sorted(base.rglob("*.sh")):
-                    any_found = True
-                    try:
-                        print(f"  - {p.relative_to(base)}")
-                    except Exception:
-                        print(f"  - {p}")
-                if not any_found:
+                found = list_sh(base, recursive=True)
+                for rel in found:
+                    print(f"  - {rel}")
+                if not found:
                     print("  (no scripts found)")
             else:
                 print("  (scripts/main directory not found)")
@@ -1983,15 +3433,18 @@ def run_single_script(sc: ServerConfig, gcfg: GlobalConfig, alias: str, script_n
         return 1
 
     try:
-        cli = SSHClient(sc.host, use_port, sc.user, sc.password, get_ssh_keyfile(sc))
-        cli.connect(timeout=5)
+        cli = get_or_connect(sc, use_port)
     except Exception as e:
         error(f"SSH connection failed: {e}")
         return 1
 
     try:
         progress(f"Uploading {script_name} to server...")
-        remote_path = upload_script(cli, local_script)
+        try:
+            remote_path = upload_script(cli, local_script, verify=sc.verify_uploads)
+        except IOError as e:
+            error(f"Script upload failed: {e}")
+            return 1
         success("Script uploaded successfully")
         print("")
         progress(f"Executing script: {script_name} on {sc.host}")
@@ -2021,7 +3474,7 @@ def run_single_script(sc: ServerConfig, gcfg: GlobalConfig, alias: str, script_n
         success(f"Script executed successfully: {script_name}")
         return 0
     finally:
-        cli.close()
+        SSH_POOL.release(cli)
 
 
 def list_scripts(sc: ServerConfig, alias: str) -> int:
@@ -2033,17 +3486,14 @@ def list_scripts(sc: ServerConfig, alias: str) -> int:
     main_root = SCRIPT_DIR / "scripts" / "main"
     print(f"Single scripts under {main_root}:")
     if main_root.exists():
-        found_main: List[Path] = []
+        found_main: List[str] = []
         try:
-            found_main = sorted(main_root.rglob("*.sh"))
+            found_main = list_sh(main_root, recursive=True)
         except Exception:
             pass
-        if found_main:
-            for p in found_main:
-                try:
-                    print(f"  - {p.relative_to(main_root)}")
-                except Exception:
-                    print(f"  - {p}")
+        if found_main:
+            for rel in found_main:
+                print(f"  - {rel}")
         else:
             print("  (no scripts found)")
     else:
@@ -2054,10 +3504,10 @@ def list_scripts(sc: ServerConfig, alias: str) -> int:
     print("")
     print(f"Script sets available under {sets_root}:")
     if sets_root.exists():
-        sets = [p for p in sorted(sets_root.iterdir()) if p.is_dir()]
+        sets = list_subdirs(sets_root)
         if sets:
-            for d in sets:
-                print(f"  - {d.name}")
+            for name in sets:
+                print(f"  - {name}")
         else:
             print("  (no sets found)")
     else:
@@ -2088,15 +3538,18 @@ def show_logs(gcfg: GlobalConfig, log_type: str, lines: int) -> int:
         print("Available log types: main, error, remote")
         return 1
 
+    flush_logs()
     if log_file.exists():
         print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         # Tail last N lines efficiently
         try:
             with log_file.open("rb") as f:
-                data = tail_bytes(f, lines)
-            sys.stdout.write(data.decode(errors="ignore"))
-        except Exception:
-            sys.stdout.write(log_file.read_text(encoding="utf-8", errors="ignore"))
+                offset, end = tail_offset(f, lines)
+                write_file_range(f, offset, end)
+        except Exception as e:
+            # No whole-file fallback: reading a multi-GB log into memory is worse than failing
+            error(f"Failed to read log file {log_file}: {e}")
+            return 1
         print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         print("")
         print(f"Log file location: {log_file}")
@@ -2133,24 +3586,31 @@ def clear_logs(gcfg: GlobalConfig, log_type: str) -> int:
     else:
         error(f"Unknown log type: {log_type}")
         return 1
+    flush_logs()
     cleared = 0
     for f in files:
+        # Truncate in place: one syscall, keeps owner/mode, and open append handles stay valid
         try:
-            f.write_text("")
+            os.truncate(f, 0)
             cleared += 1
-        except Exception:
-            pass
+        except OSError:
+            pass  # missing log file: nothing to clear
     if cleared:
         info(f"{('All logs' if log_type=='all' else log_type.title()+' log')} cleared")
-        # Remove rotated logs if clearing all
+        # Remove rotated logs (sofilab.log.1, ...) if clearing all
         if log_type == "all":
-            for base in ("sofilab.log", "sofilab-error.log", "sofilab-remote.log"):
-                for r in gcfg.log_dir.glob(base + ".*"):
-                    try:
-                        r.unlink()
-                        cleared += 1
-                    except Exception:
-                        pass
+            bases = ("sofilab.log.", "sofilab-error.log.", "sofilab-remote.log.")
+            try:
+                with os.scandir(gcfg.log_dir) as it:
+                    rotated = [e.path for e in it if e.name.startswith(bases)]
+            except OSError:
+                rotated = []
+            for r in rotated:
+                try:
+                    os.unlink(r)
+                    cleared += 1
+                except Exception:
+                    pass
         return 0
     else:
         warn("Log file(s) not found")
@@ -2165,16 +3625,30 @@ def reset_hostkey(sc: ServerConfig) -> int:
     if not kh.exists():
         warn("No known_hosts file found")
         return 1
+    # Match a target as any comma-separated name in the host field, optionally
+    # after a @cert-authority/@revoked marker
+    alts = b"|".join(re.escape(t.encode()) for t in sorted(targets))
+    pat = re.compile(rb"^(?:@\S+\s+)?(?:\S*,)?(?:" + alts + rb")[\s,]")
     try:
-        lines = kh.read_text(encoding="utf-8", errors="ignore").splitlines()
-        new_lines = []
-        for ln in lines:
-            if any(t in ln for t in targets):
-                removed = True
-                continue
-            new_lines.append(ln)
+        tmp = tempfile.NamedTemporaryFile(dir=str(kh.parent), prefix=".known_hosts.", delete=False)
+        try:
+            with kh.open("rb") as fin, tmp:
+                for ln in fin:
+                    if pat.match(ln):
+                        removed = True
+                        continue
+                    tmp.write(ln)
+                if removed:
+                    # Data on disk before the rename, so a crash leaves old or new, never empty
+                    tmp.flush()
+                    os.fsync(tmp.fileno())
+            if removed:
+                shutil.copystat(str(kh), tmp.name)
+                os.replace(tmp.name, str(kh))
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
         if removed:
-            kh.write_text("\n".join(new_lines) + ("\n" if new_lines else ""))
             info("✓ Host keys removed successfully")
             print("")
             print("You can now connect to the server without host key warnings:")
@@ -2189,132 +3663,144 @@ def reset_hostkey(sc: ServerConfig) -> int:
         return 1
 
 
+# Windows wrapper payloads by file name; {py}/{script} are filled in at install
+# time. Bytes, so the CRLFs are written exactly (text mode would turn "\r\n"
+# into "\r\r\n"). sofilab.bat is a copy (hard link) of sofilab.cmd.
+_WIN_WRAPPER_TEMPLATES: Dict[str, bytes] = {
+    "sofilab.cmd": b'@echo off\r\n"{py}" "{script}" %*\r\n',
+    "sofilab.ps1": (
+        b"# SofiLab PowerShell shim\r\n"
+        b"$ErrorActionPreference = 'Stop'\r\n"
+        b'& "{py}" "{script}" @args\r\n'
+    ),
+}
+
+
+def _win_primary_bin() -> Path:
+    """%LOCALAPPDATA%\\SofiLab\\bin, where the Windows wrappers are installed."""
+    la = _win_local_appdata()
+    return (la if la else (Path.home() / "AppData" / "Local")) / "SofiLab" / "bin"
+
+
+def _ensure_wrappers(primary_dir: Optional[Path] = None) -> List[Path]:
+    """Write the Windows wrappers, falling back to %USERPROFILE%\\AppData\\Local.
+
+    Returns the wrapper files that now exist (empty if none could be written);
+    touches neither the registry nor the environment.
+    """
+    if primary_dir is None:
+        primary_dir = _win_primary_bin()
+    created: List[Path] = []
+
+    py_b = sys.executable.encode("utf-8")  # Use current Python interpreter
+    script_b = str(SCRIPT_PATH).encode("utf-8")
+    payloads = {
+        name: tmpl.replace(b"{py}", py_b).replace(b"{script}", script_b)
+        for name, tmpl in _WIN_WRAPPER_TEMPLATES.items()
+    }
+    cmd_bytes = payloads["sofilab.cmd"]
+    ps1_bytes = payloads["sofilab.ps1"]
+
+    def write_wrappers(target_dir: Path) -> List[Path]:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        # .cmd wrapper
+        w_cmd = target_dir / "sofilab.cmd"
+        w_cmd.write_bytes(cmd_bytes)
+        # .bat wrapper (for some shells): same bytes, so a hard link when
+        # the filesystem allows it
+        w_bat = target_dir / "sofilab.bat"
+        try:
+            w_bat.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(w_cmd, w_bat)
+        except OSError:
+            w_bat.write_bytes(cmd_bytes)
+        # .ps1 wrapper (PowerShell-friendly shim)
+        w_ps1 = target_dir / "sofilab.ps1"
+        w_ps1.write_bytes(ps1_bytes)
+        return [w_cmd, w_bat, w_ps1]
+
+    # Write wrappers only to the SofiLab user bin
+    try:
+        created.extend(write_wrappers(primary_dir))
+    except Exception as e:
+        warn(f"Could not write wrappers to {primary_dir}: {e}")
+
+    # Verify at least one wrapper exists
+    created = [p for p in created if p.exists()]
+    if not created:
+        # Final fallback: try explicit %USERPROFILE%\\AppData\\Local path
+        up_dir = Path.home() / "AppData" / "Local" / "SofiLab" / "bin"
+        try:
+            created.extend(write_wrappers(up_dir))
+        except Exception as e:
+            warn(f"Could not write wrappers to {up_dir}: {e}")
+        created = [p for p in created if p.exists()]
+    return created
+
+
 def install_cli() -> int:
     # Always install the Python CLI as the main command
     if os.name == "nt":
         # Windows: create per-user wrappers, try multiple locations, and add to PATH
         try:
-            created: List[Path] = []
-
-            # Primary location: robust LocalAppData
-            la = _win_local_appdata()
-            primary_dir = (la if la else (Path.home() / "AppData" / "Local")) / "SofiLab" / "bin"
-
-            py = sys.executable  # Use current Python interpreter
-            script = str(SCRIPT_PATH)
-
-            def write_wrappers(target_dir: Path) -> List[Path]:
-                made: List[Path] = []
-                target_dir.mkdir(parents=True, exist_ok=True)
-                # .cmd wrapper
-                w_cmd = target_dir / "sofilab.cmd"
-                w_cmd.write_text("@echo off\r\n" f"\"{py}\" \"{script}\" %*\r\n", encoding="utf-8")
-                made.append(w_cmd)
-                # .bat wrapper (for some shells)
-                w_bat = target_dir / "sofilab.bat"
-                w_bat.write_text("@echo off\r\n" f"\"{py}\" \"{script}\" %*\r\n", encoding="utf-8")
-                made.append(w_bat)
-                # .ps1 wrapper (PowerShell-friendly shim)
-                w_ps1 = target_dir / "sofilab.ps1"
-                w_ps1.write_text(
-                    "# SofiLab PowerShell shim\n"
-                    "$ErrorActionPreference = 'Stop'\n"
-                    f"& \"{py}\" \"{script}\" @args\n",
-                    encoding="utf-8",
-                )
-                made.append(w_ps1)
-                return made
-
-            # Write wrappers only to the SofiLab user bin
-            try:
-                created.extend(write_wrappers(primary_dir))
-            except Exception as e:
-                warn(f"Could not write wrappers to {primary_dir}: {e}")
-
-            # Verify at least one wrapper exists
-            created = [p for p in created if p.exists()]
+            primary_dir = _win_primary_bin()
+            created = _ensure_wrappers(primary_dir)
             if not created:
-                # Final fallback: try explicit %USERPROFILE%\AppData\Local path
-                try:
-                    up_dir = Path.home() / "AppData" / "Local" / "SofiLab" / "bin"
-                    created.extend(write_wrappers(up_dir))
-                except Exception as e:
-                    warn(f"Could not write wrappers to {up_dir}: {e}")
-                created = [p for p in created if p.exists()]
-                if not created:
-                    error("Failed to create any wrapper files in user locations.")
-                    return 1
+                error("Failed to create any wrapper files in user locations.")
+                return 1
 
-            # Add primary_dir to PATH in HKCU if missing
+            # Prepend primary_dir to PATH and make sure PATHEXT has .CMD/.BAT in HKCU,
+            # through one registry handle and one change broadcast
+            env_changed = False
             try:
                 import winreg  # type: ignore
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_READ) as k:
+                with _win_env_key() as k:
+                    current = _win_query_values(k, ("Path", "PATHEXT"))
                     try:
-                        current_path, reg_type = winreg.QueryValueEx(k, "Path")
-                    except FileNotFoundError:
-                        current_path, reg_type = "", winreg.REG_EXPAND_SZ
-                parts = [p for p in (current_path or "").split(";") if p]
-                norm = lambda s: s.strip().lower().rstrip("\\/")
-                norm_parts = [norm(p) for p in parts]
-                target_norm = norm(str(primary_dir))
-
-                # Build new PATH with SofiLab prepended, removing duplicates
-                new_parts: List[str] = []
-                new_parts.append(str(primary_dir))
-                for p in parts:
-                    if norm(p) == target_norm:
-                        continue
-                    new_parts.append(p)
-
-                new_path = ";".join([s.strip().strip(';') for s in new_parts if s]).strip(';')
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_SET_VALUE) as k:
-                    reg_type_out = reg_type if reg_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ) else winreg.REG_EXPAND_SZ
-                    winreg.SetValueEx(k, "Path", 0, reg_type_out, new_path)
-                try:
-                    os.environ["PATH"] = new_path
-                except Exception:
-                    pass
-                try:
-                    import ctypes
-                    HWND_BROADCAST = 0xFFFF
-                    WM_SETTINGCHANGE = 0x001A
-                    SMTO_ABORTIFHUNG = 0x0002
-                    ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, None)
-                except Exception:
-                    pass
-            except Exception:
-                pass
+                        current_path, reg_type = current.get("Path", ("", winreg.REG_EXPAND_SZ))
+                        # Build new PATH with SofiLab prepended, removing duplicates in one
+                        # pass: normalised entry -> first spelling seen (dicts keep order)
+                        sofidir = str(primary_dir)
+                        entries = {_win_path_key(sofidir): sofidir}
+                        for p in (current_path or "").split(";"):
+                            p = p.strip()
+                            if p:
+                                entries.setdefault(_win_path_key(p), p)
+                        new_path = ";".join(entries.values())
+                        # Reinstalls usually find PATH already in shape: no write, no broadcast
+                        if new_path != current_path:
+                            reg_type_out = reg_type if reg_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ) else winreg.REG_EXPAND_SZ
+                            winreg.SetValueEx(k, "Path", 0, reg_type_out, new_path)
+                            env_changed = True
+                            try:
+                                os.environ["PATH"] = new_path
+                            except Exception:
+                                pass
+                    except Exception:
+                        pass
 
-            # Ensure PATHEXT contains .CMD and .BAT
-            try:
-                import winreg  # type: ignore
-                try:
-                    with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_READ) as k:
-                        user_pathext, pe_type = winreg.QueryValueEx(k, "PATHEXT")
-                except FileNotFoundError:
-                    pe_type = None
-                    user_pathext = os.environ.get("PATHEXT", "")
-                pathext_parts = [p.strip().strip('"').upper() for p in (user_pathext or "").split(";") if p]
-                changed = False
-                for ext in (".CMD", ".BAT"):
-                    if ext not in pathext_parts:
-                        pathext_parts.append(ext)
-                        changed = True
-                if changed:
-                    new_pathext = ";".join(pathext_parts)
-                    with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_SET_VALUE) as k:
-                        winreg.SetValueEx(k, "PATHEXT", 0, winreg.REG_EXPAND_SZ, new_pathext)
-                    os.environ["PATHEXT"] = new_pathext
                     try:
-                        import ctypes
-                        HWND_BROADCAST = 0xFFFF
-                        WM_SETTINGCHANGE = 0x001A
-                        SMTO_ABORTIFHUNG = 0x0002
-                        ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, None)
+                        user_pathext, pe_type = current.get("PATHEXT", (os.environ.get("PATHEXT", ""), None))
+                        pathext_parts = [p.strip().strip('"').upper() for p in (user_pathext or "").split(";") if p]
+                        changed = False
+                        for ext in (".CMD", ".BAT"):
+                            if ext not in pathext_parts:
+                                pathext_parts.append(ext)
+                                changed = True
+                        if changed:
+                            new_pathext = ";".join(pathext_parts)
+                            winreg.SetValueEx(k, "PATHEXT", 0, winreg.REG_EXPAND_SZ, new_pathext)
+                            env_changed = True
+                            os.environ["PATHEXT"] = new_pathext
                     except Exception:
                         pass
             except Exception:
                 pass
+            if env_changed:
+                _win_broadcast_env_change()
 
             info("✓ Installation successful! IMPORTANT: fully close and reopen your terminal to use 'sofilab'.")
             # Print locations we wrote to
@@ -2346,8 +3832,7 @@ def install_cli() -> int:
     dest = system_bin / "sofilab"
     try:
         system_bin.mkdir(parents=True, exist_ok=True)
-        if dest.is_symlink() or dest.exists():
-            dest.unlink()
+        dest.unlink(missing_ok=True)
         dest.symlink_to(SCRIPT_PATH)
         info("✓ Installation successful! 'sofilab' now points to the Python CLI.")
         return 0
@@ -2357,8 +3842,7 @@ def install_cli() -> int:
         try:
             user_bin.mkdir(parents=True, exist_ok=True)
             user_dest = user_bin / "sofilab"
-            if user_dest.is_symlink() or user_dest.exists():
-                user_dest.unlink()
+            user_dest.unlink(missing_ok=True)
             try:
                 user_dest.symlink_to(SCRIPT_PATH)
             except Exception:
@@ -2385,47 +3869,34 @@ def uninstall_cli() -> int:
         try:
             local_app = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
             install_dir = Path(local_app) / "SofiLab" / "bin"
-            wrapper = install_dir / "sofilab.cmd"
-            wrapper_bat = install_dir / "sofilab.bat"
-            wrapper_ps1 = install_dir / "sofilab.ps1"
-            if wrapper.exists():
-                wrapper.unlink()
-                info("Removed Windows wrapper sofilab.cmd")
-            else:
-                warn("No Windows wrapper found to remove")
-            if wrapper_bat.exists():
-                wrapper_bat.unlink()
-                info("Removed Windows wrapper sofilab.bat")
-            if wrapper_ps1.exists():
-                wrapper_ps1.unlink()
-                info("Removed Windows wrapper sofilab.ps1")
+            # Unlink directly (one call per wrapper) instead of probing each first
+            for name in ("sofilab.cmd", "sofilab.bat", "sofilab.ps1"):
+                try:
+                    (install_dir / name).unlink()
+                    info(f"Removed Windows wrapper {name}")
+                except FileNotFoundError:
+                    if name == "sofilab.cmd":
+                        warn("No Windows wrapper found to remove")
             # Attempt to remove path entry from HKCU if present
             try:
                 import winreg  # type: ignore
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_READ) as k:
+                with _win_env_key() as k:
                     try:
                         current_path, reg_type = winreg.QueryValueEx(k, "Path")
                     except FileNotFoundError:
                         current_path, reg_type = "", winreg.REG_EXPAND_SZ
-                parts = [p.strip() for p in current_path.split(";") if p.strip()]
-                cleaned = [p for p in parts if Path(p).resolve().as_posix().lower().rstrip("/") != install_dir.resolve().as_posix().lower().rstrip("/")]
-                if cleaned != parts:
-                    new_path = ";".join(cleaned)
-                    with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_SET_VALUE) as k:
+                    parts = [p.strip() for p in current_path.split(";") if p.strip()]
+                    install_key = install_dir.resolve().as_posix().lower().rstrip("/")
+                    cleaned = [p for p in parts if Path(p).resolve().as_posix().lower().rstrip("/") != install_key]
+                    if cleaned != parts:
+                        new_path = ";".join(cleaned)
                         reg_type_out = reg_type if reg_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ) else winreg.REG_EXPAND_SZ
                         winreg.SetValueEx(k, "Path", 0, reg_type_out, new_path)
-                    try:
-                        os.environ["PATH"] = new_path
-                    except Exception:
-                        pass
-                    try:
-                        import ctypes
-                        HWND_BROADCAST = 0xFFFF
-                        WM_SETTINGCHANGE = 0x001A
-                        SMTO_ABORTIFHUNG = 0x0002
-                        ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, None)
-                    except Exception:
-                        pass
+                        try:
+                            os.environ["PATH"] = new_path
+                        except Exception:
+                            pass
+                        _win_broadcast_env_change()
             except Exception:
                 pass
             return 0
@@ -2435,40 +3906,39 @@ def uninstall_cli() -> int:
     # POSIX cleanup: system and user bins
     removed: List[Path] = []
     not_removed: List[Tuple[Path, str]] = []
-    candidates = [Path("/usr/local/bin/sofilab"), Path.home() / ".local" / "bin" / "sofilab"]
-    # Also scan PATH for any shims that point back to this repo's script
-    try:
-        path_dirs = [Path(p) for p in os.environ.get("PATH", "").split(":") if p]
-        for d in path_dirs:
-            p = d / "sofilab"
-            if p in candidates:
-                continue
-            if p.exists():
-                candidates.append(p)
-    except Exception:
-        pass
+    known = [Path("/usr/local/bin/sofilab"), Path.home() / ".local" / "bin" / "sofilab"]
+    known_posix = {p.as_posix() for p in known}
+    # Known locations plus any PATH shims that may point back to this repo's
+    # script, deduplicated in order and lstat'ed once each; the result answers
+    # both "is it there" and "is it a symlink" below
+    candidates: Dict[Path, os.stat_result] = {}
+    for p in known + [Path(d) / "sofilab" for d in os.environ.get("PATH", "").split(":") if d]:
+        if p in candidates:
+            continue
+        try:
+            candidates[p] = p.lstat()
+        except OSError:
+            pass
 
-    for pth in candidates:
+    for pth, st in candidates.items():
         try:
-            if not (pth.exists() or pth.is_symlink()):
-                continue
             # Determine if it's safe to remove
             remove_ok = False
             try:
-                if pth.as_posix() in {"/usr/local/bin/sofilab", str((Path.home()/".local"/"bin"/"sofilab").as_posix())}:
+                if pth.as_posix() in known_posix:
                     # Known locations installed by us
                     remove_ok = True
-                elif pth.is_symlink():
+                elif stat.S_ISLNK(st.st_mode):
                     tgt = pth.resolve()
                     # Remove if it points to this script or to a sofilab.py in this repo
                     if tgt == SCRIPT_PATH or tgt.name == "sofilab.py":
                         remove_ok = True
                 else:
                     # Inspect small wrappers for our script path
-                    with pth.open("r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read(4096)
-                        if "sofilab.py" in content or str(SCRIPT_PATH) in content:
-                            remove_ok = True
+                    with pth.open("rb") as f:
+                        head = f.read(4096)
+                    if b"sofilab.py" in head or os.fsencode(SCRIPT_PATH) in head:
+                        remove_ok = True
             except Exception:
                 pass
 
@@ -2500,9 +3970,9 @@ def uninstall_cli() -> int:
             print("  sudo rm -f /usr/local/bin/sofilab")
         return 0
     else:
-        # Nothing removed; check if a root-owned /usr/local/bin/sofilab exists
-        ul = Path("/usr/local/bin/sofilab")
-        if ul.exists() or ul.is_symlink():
+        # Nothing removed; a root-owned /usr/local/bin/sofilab would already
+        # have been lstat'ed into candidates
+        if Path("/usr/local/bin/sofilab") in candidates:
             warn("'sofilab' found in /usr/local/bin but cannot remove without sudo")
             print("Run this to complete uninstall:")
             print("  sudo rm -f /usr/local/bin/sofilab && hash -r")
@@ -2524,8 +3994,7 @@ def doctor_cli(repair_path: bool = False) -> int:
     print(f"Script: {SCRIPT_PATH}")
 
     if os.name == "nt":
-        la = _win_local_appdata()
-        primary_dir = ((la if la else (Path.home() / "AppData" / "Local"))) / "SofiLab" / "bin"
+        primary_dir = _win_primary_bin()
         paths = [primary_dir]
         try:
             import sysconfig
@@ -2540,16 +4009,31 @@ def doctor_cli(repair_path: bool = False) -> int:
 
         found_any = False
         for p in paths:
+            # One directory listing per candidate instead of a stat per wrapper name
+            try:
+                with os.scandir(p) as it:
+                    present = {e.name.lower() for e in it}
+            except OSError:
+                continue
             for name in ("sofilab.cmd", "sofilab.bat", "sofilab.ps1"):
-                fp = p / name
-                if fp.exists():
-                    print(f"✓ Found: {fp}")
+                if name in present:
+                    print(f"✓ Found: {p / name}")
                     found_any = True
         if not found_any:
             print("⚠️  No wrappers found. Attempting to (re)create wrappers...")
             try:
-                # Reuse installer logic to write wrappers
-                install_cli()
+                created = _ensure_wrappers(primary_dir)
+                if not created:
+                    error("Repair failed: could not write any wrapper files")
+                    return 1
+                # Registry PATH/PATHEXT and the change broadcast only when the
+                # wrapper dir is not already on PATH
+                bin_key = _win_path_key(str(created[0].parent))
+                if not any(_win_path_key(p) == bin_key for p in os.environ.get("PATH", "").split(";")):
+                    install_cli()
+                else:
+                    for d in sorted({p.parent for p in created}, key=lambda p: str(p).lower()):
+                        print(f"✓ Rewrote wrappers in: {d}")
             except Exception as e:
                 error(f"Repair failed: {e}")
                 return 1
@@ -2570,7 +4054,10 @@ def doctor_cli(repair_path: bool = False) -> int:
         def has_unmatched_quote(s: str) -> bool:
             return s.count('"') % 2 != 0
         any_issue = False
-        for idx, seg in enumerate(segments):
+        # Per-segment stats only when the string itself looks off or a repair
+        # was asked for; a healthy PATH costs no filesystem calls
+        suspect = '"' in path_str or ";;" in path_str or path_str.startswith(";") or path_str.endswith(";")
+        for idx, seg in enumerate(segments if suspect or repair_path else ()):
             s = seg.strip()
             if not s:
                 continue
@@ -2596,46 +4083,35 @@ def doctor_cli(repair_path: bool = False) -> int:
             print("Attempting PATH repair (user PATH only)...")
             try:
                 import winreg
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_READ) as k:
+                with _win_env_key() as k:
                     try:
                         current_path, reg_type = winreg.QueryValueEx(k, "Path")
                     except FileNotFoundError:
                         current_path, reg_type = "", winreg.REG_EXPAND_SZ
-                parts = [p for p in (current_path or "").split(";") if p]
-                def clean(seg: str) -> str:
-                    s = seg.strip().strip('"').strip()
-                    # Collapse inner stray quotes
-                    return s.replace('"', '')
-                cleaned = [clean(p) for p in parts if clean(p)]
-                # Deduplicate, preserve order
-                seen = set()
-                dedup: List[str] = []
-                for p in cleaned:
-                    key = p.lower().rstrip('\\/')
-                    if key in seen:
-                        continue
-                    seen.add(key)
-                    dedup.append(p)
-                # Ensure SofiLab bin is first
-                la = _win_local_appdata()
-                sofidir = ((la if la else (Path.home() / "AppData" / "Local")) / "SofiLab" / "bin").resolve()
-                sofikey = str(sofidir).lower().rstrip('\\/')
-                dedup = [str(sofidir)] + [p for p in dedup if p.lower().rstrip('\\/') != sofikey]
-                new_path = ";".join(dedup).strip(';')
-                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Environment", 0, winreg.KEY_SET_VALUE) as k:
-                    reg_type_out = reg_type if reg_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ) else winreg.REG_EXPAND_SZ
-                    winreg.SetValueEx(k, "Path", 0, reg_type_out, new_path)
-                os.environ["PATH"] = new_path
-                try:
-                    import ctypes
-                    HWND_BROADCAST = 0xFFFF
-                    WM_SETTINGCHANGE = 0x001A
-                    SMTO_ABORTIFHUNG = 0x0002
-                    ctypes.windll.user32.SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "Environment", SMTO_ABORTIFHUNG, 5000, None)
-                except Exception:
-                    pass
-                print("✓ Rewrote user PATH to a sanitized value.")
-                print("Open a new PowerShell/cmd and try: sofilab --version")
+                    parts = [p for p in (current_path or "").split(";") if p]
+                    def clean(seg: str) -> str:
+                        s = seg.strip().strip('"').strip()
+                        # Collapse inner stray quotes
+                        return s.replace('"', '')
+                    # SofiLab bin first, then the cleaned entries deduplicated in order
+                    sofidir = str(primary_dir.resolve())
+                    entries = {_win_path_key(sofidir): sofidir}
+                    for p in parts:
+                        c = clean(p)
+                        if c:
+                            entries.setdefault(_win_path_key(c), c)
+                    new_path = ";".join(entries.values())
+                    changed = new_path != current_path
+                    if changed:
+                        reg_type_out = reg_type if reg_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ) else winreg.REG_EXPAND_SZ
+                        winreg.SetValueEx(k, "Path", 0, reg_type_out, new_path)
+                if changed:
+                    os.environ["PATH"] = new_path
+                    _win_broadcast_env_change()
+                    print("✓ Rewrote user PATH to a sanitized value.")
+                    print("Open a new PowerShell/cmd and try: sofilab --version")
+                else:
+                    print("✓ User PATH is already sanitized; the issues above come from the system PATH.")
             except Exception as e:
                 error(f"PATH repair failed: {e}")
         print("")
@@ -2657,25 +4133,97 @@ def doctor_cli(repair_path: bool = False) -> int:
 # --------------------------
 # Tailing helper
 # --------------------------
-def tail_bytes(fobj, n_lines: int, chunk_size: int = 4096) -> bytes:
+def tail_offset(fobj, n_lines: int, chunk_size: int = 4096) -> Tuple[int, int]:
+    """Return (offset, end) such that bytes [offset, end) are the last n_lines lines.
+
+    Regular files are mapped and searched with rfind from the end, so only the
+    pages holding the tail are touched. Anything mmap refuses falls back to
+    reading backwards in chunks that double up to 1 MiB.
+    """
     fobj.seek(0, os.SEEK_END)
     end = fobj.tell()
-    size = end
-    data = bytearray()
-    lines = 0
-    while end > 0 and lines <= n_lines:
-        read_size = min(chunk_size, end)
-        end -= read_size
-        fobj.seek(end)
-        buf = fobj.read(read_size)
-        data[:0] = buf
-        lines = data.count(b"\n")
-        if end == 0:
-            break
-    # keep last n_lines
-    parts = data.splitlines(keepends=True)
-    tail = b"".join(parts[-n_lines:]) if n_lines < len(parts) else data
-    return tail
+    if n_lines <= 0 or end == 0:
+        return end, end
+    try:
+        fd = fobj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fd = None
+    if fd is not None:
+        try:
+            mm = mmap.mmap(fd, end, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mm = None
+        if mm is not None:
+            with mm:
+                pos = end - 1 if mm[end - 1:end] == b"\n" else end
+                for _ in range(n_lines):
+                    pos = mm.rfind(b"\n", 0, pos)
+                    if pos < 0:
+                        return 0, end
+                return pos + 1, end
+    if not hasattr(os, "pread"):
+        fd = None
+    need = n_lines
+    pos = end
+    size = chunk_size
+    while pos > 0:
+        read_size = min(size, pos)
+        pos -= read_size
+        if fd is not None:
+            buf = os.pread(fd, read_size, pos)
+        else:
+            fobj.seek(pos)
+            buf = fobj.read(read_size)
+        if pos + read_size == end and buf.endswith(b"\n"):
+            need += 1  # the trailing newline does not start another line
+        count = buf.count(b"\n")
+        if count >= need:
+            idx = len(buf)
+            for _ in range(need):
+                idx = buf.rindex(b"\n", 0, idx)
+            return pos + idx + 1, end
+        need -= count
+        size = min(size * 2, 1 << 20)
+    return 0, end
+
+
+def tail_bytes(fobj, n_lines: int, chunk_size: int = 4096) -> bytes:
+    """Return the last n_lines lines of a binary file object."""
+    offset, end = tail_offset(fobj, n_lines, chunk_size)
+    fobj.seek(offset)
+    return fobj.read(end - offset)
+
+
+def _sendfile_ok(fd: int) -> bool:
+    """True if fd is a pipe or regular file that os.sendfile can write to."""
+    if not hasattr(os, "sendfile"):
+        return False
+    try:
+        mode = os.fstat(fd).st_mode
+    except OSError:
+        return False
+    return stat.S_ISFIFO(mode) or stat.S_ISREG(mode)
+
+
+def write_file_range(f, offset: int, end: int) -> None:
+    """Copy bytes [offset, end) of an open binary file to stdout without decoding."""
+    sys.stdout.flush()
+    out = sys.stdout.fileno()
+    if _sendfile_ok(out):
+        try:
+            while offset < end:
+                sent = os.sendfile(out, f.fileno(), offset, end - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            return
+        except OSError as e:
+            # EINVAL: e.g. stdout opened O_APPEND; copy the rest through Python
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, getattr(errno, "ENOTSUP", -1), getattr(errno, "EOPNOTSUPP", -1)):
+                raise
+    f.seek(offset)
+    sys.stdout.buffer.write(f.read(end - offset))
+    sys.stdout.buffer.flush()
 
 
 # --------------------------
@@ -2711,9 +4259,245 @@ Examples:
 """
 
 
-def main(argv: Optional[List[str]] = None) -> int:
-    argv = argv if argv is not None else sys.argv[1:]
+# Commands that open SSHClient connections (hooks may still bypass paramiko)
+_PARAMIKO_CMDS = frozenset({"cp", "status", "reboot", "run-scripts", "run-script", "ls-remote", "download", "upload", "router-webui", "exec"})
+# Self-install and diagnostics: dispatched before the config is read, logging to the default log dir
+_NO_CONFIG_CMDS = frozenset({"install", "uninstall", "doctor"})
 
+
+# --------------------------
+# Command handlers (dispatched from main by subcommand name)
+# --------------------------
+def _cmd_exec(args, sc: ServerConfig, alias: str, gcfg: GlobalConfig) -> int:
+    if args.tty:
+        gcfg.force_tty = True
+    if args.no_tty:
+        gcfg.force_tty = False
+    cmdv = args.exec_argv or []
+    # Basic trim if parser included a leading '--'
+    if cmdv and cmdv[0] == "--":
+        cmdv = cmdv[1:]
+    # Salvage known exec options that argparse placed into remainder
+    env_acc: List[str] = list(args.env or [])
+    workdir_val: Optional[str] = args.workdir
+    tty_set: Optional[bool] = None
+    out_tokens: List[str] = []
+    i = 0
+    while i < len(cmdv):
+        tok = cmdv[i]
+        if tok == "--":
+            i += 1
+            # Remainder after '--' is remote command as-is
+            out_tokens.extend(cmdv[i:])
+            i = len(cmdv)
+            break
+        if tok == "--env":
+            if i + 1 < len(cmdv):
+                env_acc.append(cmdv[i + 1])
+                i += 2
+                continue
+        if tok == "--workdir":
+            if i + 1 < len(cmdv):
+                workdir_val = cmdv[i + 1]
+                i += 2
+                continue
+        if tok == "--tty":
+            tty_set = True
+            i += 1
+            continue
+        if tok == "--no-tty":
+            tty_set = False
+            i += 1
+            continue
+        # Unknown/command token: keep
+        out_tokens.append(tok)
+        i += 1
+    if tty_set is not None:
+        gcfg.force_tty = bool(tty_set)
+    log.info("exec argv (post-trim): %s", repr(cmdv))
+    log.info("exec argv (post-salvage): %s", repr(out_tokens))
+    if env_acc:
+        log.info("exec env: %s", repr(env_acc))
+    if workdir_val:
+        log.info("exec workdir: %s", workdir_val)
+    return execute_remote_command(sc, alias, out_tokens, gcfg.force_tty, env_acc, workdir_val)
+
+
+def _cmd_run_scripts(args, sc: ServerConfig, alias: str, gcfg: GlobalConfig) -> int:
+    set_name = args.set
+    if not set_name:
+        error("Script set name is required: run-scripts <alias> <set> or --set <set>")
+        return 1
+    common_args = args.script_args
+    return run_scripts(sc, gcfg, alias, set_name, common_args, args.dry_run)
+
+
+def _cmd_run_script(args, sc: ServerConfig, alias: str, gcfg: GlobalConfig) -> int:
+    # Support both patterns: `--script-args ...` (stops at next option) or `--` remainder (must be last)
+    script_args_cli: Optional[List[str]] = None
+    if args.script_args_opt:
+        script_args_cli = args.script_args_opt
+    elif args.script_args:
+        vals = args.script_args
+        if vals and vals[0] == "--":
+            vals = vals[1:]
+        script_args_cli = vals
+    return run_single_script(sc, gcfg, alias, args.script, script_args_cli)
+
+
+def _with_sftp_client(sc: ServerConfig, action) -> int:
+    """Run action(cli) on a pooled client for sc and release it afterwards."""
+    port = determine_ssh_port(sc.port, sc.host)
+    if not port:
+        return 1
+    cli = None
+    try:
+        cli = get_or_connect(sc, port)
+        return action(cli)
+    except Exception as e:
+        error(f"SFTP error: {e}")
+        return 1
+    finally:
+        if cli is not None:
+            SSH_POOL.release(cli)
+
+
+def _resolve_local_paths(paths: List[str]) -> List[Path]:
+    """Path(p).expanduser().resolve() for each p, resolving each distinct parent
+    directory once (shell globs usually share one) and the leaf with one lstat."""
+    parents: Dict[Path, Path] = {}
+    out: List[Path] = []
+    for p in paths:
+        pp = Path(p).expanduser()
+        if pp.name in ("", ".", ".."):
+            out.append(pp.resolve())
+            continue
+        try:
+            leaf_is_link = stat.S_ISLNK(os.lstat(pp).st_mode)
+        except OSError:
+            leaf_is_link = False
+        if leaf_is_link:
+            out.append(pp.resolve())  # a symlinked source uploads under its target's name
+            continue
+        parent = parents.get(pp.parent)
+        if parent is None:
+            parent = parents[pp.parent] = pp.parent.resolve()
+        out.append(parent / pp.name)
+    return out
+
+
+def _cmd_ls_remote(args, sc: ServerConfig, alias: str, gcfg: GlobalConfig) -> int:
+    return _with_sftp_client(sc, lambda cli: sftp_list_directory(cli, args.path))
+
+
+def _cmd_download(args, sc: ServerConfig, alias: str, gcfg: GlobalConfig) -> int:
+    warn("'download' is deprecated. Use: sofilab cp alias:/path ... <local_dir>")
+    dest = Path(args.dest).expanduser().resolve()
+    return _with_sftp_client(sc, lambda cli: download_items(cli, args.remote, dest, args.recursive))
+
+
+def _cmd_upload(args, sc: ServerConfig, alias: str, gcfg: GlobalConfig) -> int:
+    warn("'upload' is deprecated. Use: sofilab cp <local...> alias:/dest")
+    locals_list = _resolve_local_paths(args.local)
+    return _with_sftp_client(sc, lambda cli: upload_items(cli, locals_list, args.dest, args.recursive))
+
+
+def _cmd_cp(args, servers: Dict[str, ServerConfig]) -> int:
+    """Unified scp-like copy; the host comes from whichever side is alias:/path."""
+    def _classify(ep: str):
+        a, sep, p = ep.partition(":")
+        if sep and a in servers:
+            return ("remote", a, p)
+        return ("local", None, ep)
+
+    # One pass over the sources: classification plus the (single) remote alias
+    srcs = []
+    remote_alias: Optional[str] = None
+    multi_remote = False
+    for s in args.src:
+        t = _classify(s)
+        srcs.append(t)
+        if t[1] is not None:
+            if remote_alias is None:
+                remote_alias = t[1]
+            elif t[1] != remote_alias:
+                multi_remote = True
+    src_has_remote = remote_alias is not None
+    dest_t = _classify(args.dest)
+    dest_is_remote = dest_t[0] == "remote"
+
+    if src_has_remote and dest_is_remote:
+        error("Remote-to-remote copy is not supported")
+        return 1
+    if not src_has_remote and not dest_is_remote:
+        error("Local-to-local copy is not supported; at least one side must be remote")
+        return 1
+    if multi_remote:
+        error("Sources span multiple remote aliases; copy one host at a time")
+        return 1
+
+    # Determine direction and alias; _classify only marks configured aliases
+    # remote, so this is the one lookup
+    sc = servers[remote_alias if src_has_remote else dest_t[1]]
+    if src_has_remote:
+        # download: remote sources -> local dest
+        remote_paths = [p for t,_,p in srcs if t == "remote"]
+        local_dest = Path(dest_t[2]).expanduser().resolve()
+        info("Note: use 'cp -r' to transfer directories recursively")
+        return _with_sftp_client(sc, lambda cli: download_items(cli, remote_paths, local_dest, args.recursive))
+    else:
+        # upload: local sources -> remote dest
+        local_paths = _resolve_local_paths([p for t,_,p in srcs if t == "local"])
+        remote_dest = dest_t[2]
+        info("Note: use 'cp -r' to transfer directories recursively")
+        return _with_sftp_client(sc, lambda cli: upload_items(cli, local_paths, remote_dest, args.recursive))
+
+
+# Commands that pick their host(s) from the arguments: handler(args, servers)
+CONFIG_COMMANDS = {
+    "cp": _cmd_cp,
+}
+
+# Commands that need no host alias: handler(args, gcfg)
+LOCAL_COMMANDS = {
+    "install": lambda a, g: install_cli(),
+    "uninstall": lambda a, g: uninstall_cli(),
+    "doctor": lambda a, g: doctor_cli(repair_path=a.repair_path),
+    "logs": lambda a, g: show_logs(g, a.type, a.lines),
+    "clear-logs": lambda a, g: clear_logs(g, a.type),
+}
+
+# Commands that act on one resolved host: handler(args, sc, alias, gcfg)
+HOST_COMMANDS = {
+    "login": lambda a, sc, al, g: ssh_login(sc, al),
+    "reset-hostkey": lambda a, sc, al, g: reset_hostkey(sc),
+    "status": lambda a, sc, al, g: server_status(sc, al, a.port, a.hook_args),
+    "reboot": lambda a, sc, al, g: reboot_server(sc, a.wait, al, a.hook_args),
+    "list-scripts": lambda a, sc, al, g: list_scripts(sc, al),
+    "exec": _cmd_exec,
+    "run-scripts": _cmd_run_scripts,
+    "run-script": _cmd_run_script,
+    "ls-remote": _cmd_ls_remote,
+    "download": _cmd_download,
+    "upload": _cmd_upload,
+    # Alias normalization and validation are handled in main
+    "router-webui": lambda a, sc, al, g: router_webui(sc, a.action),
+}
+
+
+def print_version() -> int:
+    border = "=" * 70
+    print(border)
+    print(f"SofiLab • Server Management Tool by {AUTHOR}")
+    print(f"Script: {SCRIPT_NAME}  Version: {VERSION} (Build {BUILD_DATE})")
+    print("Features: SSH connections, server monitoring, installation management")
+    print(border)
+    return 0
+
+
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """The CLI parser; built once per process since main() may be re-entered."""
     parser = argparse.ArgumentParser(
         prog=SCRIPT_NAME,
         description="SofiLab • Server Management Tool (Python)",
@@ -2766,7 +4550,7 @@ def main(argv: Optional[List[str]] = None) -> int:
     p_list.add_argument("--hostname", dest="alias_opt", help="Alias (compat)")
 
     p_runall = sub.add_parser("run-scripts", help="Run an ordered set of scripts from scripts/sets/<name> by numeric prefix")
-    p_runall.add_argument("alias", nargs="?", help="Target host alias (positional, or use --host-alias)")
+    p_runall.add_argument("alias", nargs="?", help="Target host alias, or several comma-separated (positional, or use --host-alias)")
     p_runall.add_argument("set_pos", nargs="?", help="Script set name under scripts/sets/<name> (positional)")
     p_runall.add_argument("--set", dest="set_opt", help="Script set name under scripts/sets/<name> (optional flag)")
     p_runall.add_argument("--host-alias", dest="alias_opt", help="Target host alias")
@@ -2774,6 +4558,8 @@ def main(argv: Optional[List[str]] = None) -> int:
     p_runall.add_argument("--tty", dest="tty", action="store_true")
     p_runall.add_argument("--no-tty", dest="no_tty", action="store_true")
     p_runall.add_argument("--dry-run", action="store_true", help="List planned execution without running")
+    p_runall.add_argument("--parallel", type=int, default=0, help="Max hosts run concurrently when several aliases are given (default: min(16, hosts))")
+    p_runall.add_argument("--all", dest="all_hosts", action="store_true", help="Run the set on every configured server (one alias per server block)")
     p_runall.add_argument("script_args", nargs=argparse.REMAINDER, help="Use after -- to pass common args to each script")
 
     p_runone = sub.add_parser("run-script")
@@ -2843,12 +4629,46 @@ def main(argv: Optional[List[str]] = None) -> int:
     # (speed test command removed for now)
 
     parser.add_argument("--version", "-V", action="store_true", help="Show version and exit")
+    parser.add_argument("--no-cache", action="store_true", help="Re-resolve DNS, SSH port and key file on every use")
+    # Attributes only some subcommands define; with these main() and the
+    # handlers read args.<name> directly whatever the subcommand
+    parser.set_defaults(
+        alias=None, alias_opt=None, set=None, set_opt=None, set_pos=None,
+        script_opt=None, script_args=None, script_args_opt=None, hook_args=None,
+        exec_argv=None, env=None, workdir=None,
+        tty=False, no_tty=False, all_hosts=False, dry_run=False, parallel=0, repair_path=False,
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = argv if argv is not None else sys.argv[1:]
+
+    # Plain `sofilab --version` needs neither the parser nor the config
+    if argv and argv[0] in ("--version", "-V") and len(argv) == 1:
+        return print_version()
+
+    parser = _build_parser()
 
     if not argv:
         parser.print_help()
         return 0
 
-    # Parse config first for logging
+    # CLI parse
+    args = parser.parse_args(argv)
+
+    if args.version:
+        return print_version()
+
+    if args.no_cache:
+        disable_lookup_caches()
+
+    # Self-install and diagnostics skip the config; they log with the defaults
+    if args.cmd in _NO_CONFIG_CMDS:
+        init_logging(GlobalConfig())
+        return LOCAL_COMMANDS[args.cmd](args, None)
+
+    # Parse config for logging and host lookup
     try:
         gcfg, servers = parse_conf(CONFIG_FILE)
     except FileNotFoundError:
@@ -2857,125 +4677,41 @@ def main(argv: Optional[List[str]] = None) -> int:
         gcfg = GlobalConfig()
         servers = {}
 
-    # CLI parse
-    args = parser.parse_args(argv)
-
-    if args.version:
-        border = "=" * 70
-        print(border)
-        print(f"SofiLab • Server Management Tool by {AUTHOR}")
-        print(f"Script: {SCRIPT_NAME}  Version: {VERSION} (Build {BUILD_DATE})")
-        print("Features: SSH connections, server monitoring, installation management")
-        print(border)
-        return 0
-
     # Init logging
     init_logging(gcfg)
-    log.info("Command executed: %s %s", SCRIPT_NAME, " ".join(shlex.quote(a) for a in argv))
+    global SSH_BACKEND, SFTP_MAX_REQUESTS, SFTP_PARALLEL, SFTP_WRITE_SIZE
+    SSH_BACKEND = gcfg.ssh_backend
+    SFTP_MAX_REQUESTS = gcfg.sftp_max_requests
+    SFTP_PARALLEL = gcfg.sftp_parallel
+    SFTP_WRITE_SIZE = gcfg.sftp_write_size
+    # The quoted argv is only built when INFO records go anywhere (not with logging off)
+    if log.isEnabledFor(logging.INFO):
+        log.info("Command executed: %s %s", SCRIPT_NAME, " ".join(shlex.quote(a) for a in argv))
     log.info("Configuration loaded - LOG_DIR: %s, LOG_LEVEL: %s, ENABLE_LOGGING: %s", gcfg.log_dir, gcfg.log_level, gcfg.enable_logging)
 
-    if args.cmd == "install":
-        return install_cli()
-    if args.cmd == "uninstall":
-        return uninstall_cli()
-    if args.cmd == "doctor":
-        return doctor_cli(repair_path=getattr(args, "repair_path", False))
-    if args.cmd == "logs":
-        return show_logs(gcfg, args.type, args.lines)
-    if args.cmd == "clear-logs":
-        return clear_logs(gcfg, args.type)
-
-    # Unified cp is handled before host-required commands
-    if args.cmd == "cp":
-        def _classify(ep: str):
-            if ":" in ep:
-                a, p = ep.split(":", 1)
-                if a in servers:
-                    return ("remote", a, p)
-            return ("local", None, ep)
-
-        srcs = [ _classify(s) for s in args.src ]
-        dest_t = _classify(args.dest)
-
-        src_remote_aliases = {a for t,a,_ in srcs if t == "remote"}
-        src_has_remote = any(t == "remote" for t,_,_ in srcs)
-        dest_is_remote = dest_t[0] == "remote"
-
-        if src_has_remote and dest_is_remote:
-            error("Remote-to-remote copy is not supported")
-            return 1
-        if not src_has_remote and not dest_is_remote:
-            error("Local-to-local copy is not supported; at least one side must be remote")
-            return 1
-        if src_has_remote and len(src_remote_aliases) > 1:
-            error("Sources span multiple remote aliases; copy one host at a time")
-            return 1
+    handler = LOCAL_COMMANDS.get(args.cmd)
+    if handler:
+        return handler(args, gcfg)
 
-        # Determine direction and alias
-        if src_has_remote:
-            # download: remote sources -> local dest
-            alias = next(iter(src_remote_aliases))
-            sc = servers.get(alias)
-            if not sc:
-                error(f"Unknown host-alias: {alias}")
-                return 1
-            port = determine_ssh_port(sc.port, sc.host)
-            if not port:
-                return 1
-            keyfile = get_ssh_keyfile(sc)
-            try:
-                cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-                cli.connect(timeout=5)
-                remote_paths = [p for t,_,p in srcs if t == "remote"]
-                local_dest = Path(dest_t[2]).expanduser().resolve()
-                info("Note: use 'cp -r' to transfer directories recursively")
-                return download_items(cli, remote_paths, local_dest, args.recursive)
-            except Exception as e:
-                error(f"SFTP error: {e}")
-                return 1
-            finally:
-                try:
-                    cli.close()  # type: ignore
-                except Exception:
-                    pass
-        else:
-            # upload: local sources -> remote dest
-            alias = dest_t[1]
-            sc = servers.get(alias) if alias else None
-            if not sc:
-                error(f"Unknown host-alias: {alias}")
-                return 1
-            port = determine_ssh_port(sc.port, sc.host)
-            if not port:
-                return 1
-            keyfile = get_ssh_keyfile(sc)
-            try:
-                cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-                cli.connect(timeout=5)
-                local_paths = [Path(p).expanduser().resolve() for t,_,p in srcs if t == "local"]
-                remote_dest = dest_t[2]
-                info("Note: use 'cp -r' to transfer directories recursively")
-                return upload_items(cli, local_paths, remote_dest, args.recursive)
-            except Exception as e:
-                error(f"SFTP error: {e}")
-                return 1
-            finally:
-                try:
-                    cli.close()  # type: ignore
-                except Exception:
-                    pass
+    # Everything below may talk SSH via paramiko
+    if args.cmd in _PARAMIKO_CMDS:
+        _prewarm_paramiko()
+
+    handler = CONFIG_COMMANDS.get(args.cmd)
+    if handler:
+        return handler(args, servers)
 
     # Normalize flexible inputs for commands supporting alias options before checks
-    if args.cmd in {"login", "reset-hostkey", "status", "reboot", "list-scripts", "run-scripts", "run-script", "ls-remote", "download", "upload", "router-webui", "exec"}:
-        prev_alias = getattr(args, "alias", None)
-        if getattr(args, "alias_opt", None):
+    if args.cmd in HOST_COMMANDS:
+        prev_alias = args.alias
+        if args.alias_opt:
             args.alias = args.alias_opt
         if args.cmd == "run-script":
-            if getattr(args, "script_opt", None):
+            if args.script_opt:
                 args.script = args.script_opt
             # If alias came from --host-alias/--hostname and the positional 'alias'
             # was actually the script path, recover it.
-            if getattr(args, "alias_opt", None) and prev_alias:
+            if args.alias_opt and prev_alias:
                 needs_fix = (args.script is None) or (
                     isinstance(args.script, str) and args.script.startswith('-')
                 )
@@ -2983,21 +4719,51 @@ def main(argv: Optional[List[str]] = None) -> int:
                     # Treat previous positional alias token as script path
                     args.script = prev_alias
         if args.cmd == "run-scripts":
-            set_val = getattr(args, "set_opt", None) or getattr(args, "set_pos", None)
+            set_val = args.set_opt or args.set_pos
             if set_val is not None:
                 args.set = set_val
 
     # Host-required commands
     if args.cmd == "run-scripts":
-        alias_norm = getattr(args, "alias", None) or getattr(args, "alias_opt", None)
+        if args.all_hosts:
+            # `run-scripts --all <set>`: the lone positional is the set name
+            if args.set is None and args.alias:
+                args.set = args.alias
+            primaries: Dict[int, str] = {}
+            for a, s_cfg in servers.items():
+                primaries.setdefault(id(s_cfg), a)
+            args.alias = ",".join(primaries.values())
+            if not args.alias:
+                error("No servers configured")
+                return 1
+        alias_norm = args.alias or args.alias_opt
         if not alias_norm:
             error("Host-alias required for run-scripts (use --host-alias or --hostname)")
             return 1
         alias = alias_norm
+        if "," in alias or args.all_hosts:
+            aliases = [a.strip() for a in alias.split(",") if a.strip()]
+            unknown = [a for a in aliases if a not in servers]
+            if unknown:
+                error(f"Unknown host-alias: {', '.join(unknown)}")
+                return 1
+            set_name = args.set
+            if not set_name:
+                error("Script set name is required: run-scripts <alias> <set> or --set <set>")
+                return 1
+            # Several hosts cannot share the local terminal's stdin
+            if args.tty:
+                warn("--tty is ignored when running on several hosts")
+            gcfg.force_tty = False
+            return run_scripts_many(servers, gcfg, aliases, set_name, args.script_args,
+                                    args.dry_run, args.parallel)
     else:
-        if not getattr(args, "alias", None):
-            error("Host-alias required for this command")
-            parser.print_help()
+        if not args.alias:
+            if args.cmd is None:
+                # Only global options given: the full help is the useful answer
+                parser.print_help()
+            else:
+                error(f"Host-alias required for this command. Try: {SCRIPT_NAME} {args.cmd} --help")
             return 1
         alias = args.alias
     sc = servers.get(alias)
@@ -3006,158 +4772,16 @@ def main(argv: Optional[List[str]] = None) -> int:
         return 1
 
     # Allow CLI to override TTY for run-scripts/run-script
-    if hasattr(args, "tty") or hasattr(args, "no_tty"):
-        if getattr(args, "tty", False):
-            gcfg.force_tty = True
-        if getattr(args, "no_tty", False):
-            gcfg.force_tty = False
-
-    if args.cmd == "login":
-        return ssh_login(sc, alias)
-    if args.cmd == "reset-hostkey":
-        return reset_hostkey(sc)
-    if args.cmd == "status":
-        extra = getattr(args, "hook_args", None)
-        return server_status(sc, alias, args.port, extra)
-    if args.cmd == "reboot":
-        extra = getattr(args, "hook_args", None)
-        return reboot_server(sc, args.wait, alias, extra)
-    if args.cmd == "list-scripts":
-        return list_scripts(sc, alias)
-    if args.cmd == "exec":
-        if getattr(args, "tty", False):
-            gcfg.force_tty = True
-        if getattr(args, "no_tty", False):
-            gcfg.force_tty = False
-        cmdv = getattr(args, "exec_argv", None) or []
-        # Basic trim if parser included a leading '--'
-        if cmdv and cmdv[0] == "--":
-            cmdv = cmdv[1:]
-        # Salvage known exec options that argparse placed into remainder
-        env_acc: List[str] = list(getattr(args, "env", []) or [])
-        workdir_val: Optional[str] = getattr(args, "workdir", None)
-        tty_set: Optional[bool] = None
-        out_tokens: List[str] = []
-        i = 0
-        while i < len(cmdv):
-            tok = cmdv[i]
-            if tok == "--":
-                i += 1
-                # Remainder after '--' is remote command as-is
-                out_tokens.extend(cmdv[i:])
-                i = len(cmdv)
-                break
-            if tok == "--env":
-                if i + 1 < len(cmdv):
-                    env_acc.append(cmdv[i + 1])
-                    i += 2
-                    continue
-            if tok == "--workdir":
-                if i + 1 < len(cmdv):
-                    workdir_val = cmdv[i + 1]
-                    i += 2
-                    continue
-            if tok == "--tty":
-                tty_set = True
-                i += 1
-                continue
-            if tok == "--no-tty":
-                tty_set = False
-                i += 1
-                continue
-            # Unknown/command token: keep
-            out_tokens.append(tok)
-            i += 1
-        if tty_set is not None:
-            gcfg.force_tty = bool(tty_set)
-        log.info("exec argv (post-trim): %s", repr(cmdv))
-        log.info("exec argv (post-salvage): %s", repr(out_tokens))
-        if env_acc:
-            log.info("exec env: %s", repr(env_acc))
-        if workdir_val:
-            log.info("exec workdir: %s", workdir_val)
-        return execute_remote_command(sc, alias, out_tokens, gcfg.force_tty, env_acc, workdir_val)
-    if args.cmd == "run-scripts":
-        set_name = getattr(args, "set", None)
-        if not set_name:
-            error("Script set name is required: run-scripts <alias> <set> or --set <set>")
-            return 1
-        common_args = getattr(args, "script_args", None)
-        return run_scripts(sc, gcfg, alias, set_name, common_args, getattr(args, "dry_run", False))
-    if args.cmd == "run-script":
-        # Support both patterns: `--script-args ...` (stops at next option) or `--` remainder (must be last)
-        script_args_cli: Optional[List[str]] = None
-        if getattr(args, "script_args_opt", None):
-            script_args_cli = args.script_args_opt
-        elif getattr(args, "script_args", None):
-            vals = args.script_args
-            if vals and vals[0] == "--":
-                vals = vals[1:]
-            script_args_cli = vals
-        return run_single_script(sc, gcfg, alias, args.script, script_args_cli)
-    if args.cmd == "ls-remote":
-        port = determine_ssh_port(sc.port, sc.host)
-        if not port:
-            return 1
-        keyfile = get_ssh_keyfile(sc)
-        try:
-            cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-            cli.connect(timeout=5)
-            return sftp_list_directory(cli, args.path)
-        except Exception as e:
-            error(f"SFTP error: {e}")
-            return 1
-        finally:
-            try:
-                cli.close()  # type: ignore
-            except Exception:
-                pass
-    # (test-speed handler removed for now)
-    if args.cmd == "download":
-        warn("'download' is deprecated. Use: sofilab cp alias:/path ... <local_dir>")
-        port = determine_ssh_port(sc.port, sc.host)
-        if not port:
-            return 1
-        keyfile = get_ssh_keyfile(sc)
-        try:
-            cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-            cli.connect(timeout=5)
-            dest = Path(args.dest).expanduser().resolve()
-            return download_items(cli, args.remote, dest, args.recursive)
-        except Exception as e:
-            error(f"SFTP error: {e}")
-            return 1
-        finally:
-            try:
-                cli.close()  # type: ignore
-            except Exception:
-                pass
-    if args.cmd == "upload":
-        warn("'upload' is deprecated. Use: sofilab cp <local...> alias:/dest")
-        port = determine_ssh_port(sc.port, sc.host)
-        if not port:
-            return 1
-        keyfile = get_ssh_keyfile(sc)
-        try:
-            cli = SSHClient(sc.host, port, sc.user, sc.password, keyfile)
-            cli.connect(timeout=5)
-            locals_list = [Path(p).expanduser().resolve() for p in args.local]
-            return upload_items(cli, locals_list, args.dest, args.recursive)
-        except Exception as e:
-            error(f"SFTP error: {e}")
-            return 1
-        finally:
-            try:
-                cli.close()  # type: ignore
-            except Exception:
-                pass
+    if args.tty:
+        gcfg.force_tty = True
+    if args.no_tty:
+        gcfg.force_tty = False
 
-    if args.cmd == "router-webui":
-        # Handled above for alias normalization and validation
-        return router_webui(sc, args.action)
+    handler = HOST_COMMANDS.get(args.cmd)
+    if handler:
+        return handler(args, sc, alias, gcfg)
 
-    error(f"Unknown command: {args.cmd}")
-    parser.print_help()
+    error(f"Unknown command: {args.cmd}. Try: {SCRIPT_NAME} --help")
     return 1
 
 